@@ -1,44 +1,51 @@
 #!./venv/bin/python3
 import os
-import cv2
 from flask import Flask, render_template, Response, redirect, url_for, session, flash, request, send_file, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from sqlalchemy.dialects import postgresql, sqlite
+import sqlalchemy as sa
+from flask_migrate import Migrate, stamp, upgrade
 from werkzeug.utils import secure_filename
-from dumbel_curl_script import PoseDetector
+from dumbel_curl_script import PoseDetector, QUALITY_TIERS, DEFAULT_TIER
+from group_tracking import GroupPoseTracker
+from pose_quality import QualityController
+from frame_sources import open_frame_source, ThreadedFrameReader
+from stream_flow import FrameFlowControl
+from rep_segmenter import RepSegmenter
+from landmark_recorder import LandmarkRecorder, RECORD_LANDMARKS_DIR, recording_path
 from flask_cors import CORS
 import io
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_socketio import SocketIO, emit
-import base64
-import numpy as np
+from auth_hashing import hash_password, verify_password, needs_rehash
+from flask_socketio import SocketIO, emit, join_room
 from datetime import datetime
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
-from reportlab.pdfgen import canvas
+from report_jobs import ReportJobs, ReportQueueFull
+from search_index import exercise_key, ensure_search_index, search_exercises, search_workouts
+from leaderboards import LeaderboardCache, LEADERBOARD_METRICS, LEADERBOARD_PERIODS, period_start, workout_metrics
 import csv
 import time
+from collections import deque
 from chatbot_handler import chatbot_bp
+from database import configure_database, install_sqlite_pragmas
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.sqlite3'
+configure_database(app)
 app.secret_key = os.getenv("SECRET_KEY", "__privatekey__")
 app.config['STATIC_URL_PATH'] = '/static'
 app.config['STATIC_FOLDER'] = 'static'
 app.config['UPLOAD_FOLDER'] = os.path.join(app.config['STATIC_FOLDER'], 'uploads')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB
 app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['SESSION_COOKIE_SECURE'] = True
+app.config['SESSION_COOKIE_SECURE'] = os.getenv('SESSION_COOKIE_SECURE', '1') != '0'
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
 socketio = SocketIO(app, cors_allowed_origins="*")
-pose_detector = PoseDetector()
+POSE_QUALITY_TIER = os.getenv('POSE_QUALITY_TIER', DEFAULT_TIER)
+quality_controller = QualityController()
 
 # Register blueprints
 app.register_blueprint(chatbot_bp)
@@ -65,22 +72,28 @@ class User(db.Model):
     def __init__(self, name, email, password, age, height, weight, profile_picture=None):
         self.name = name
         self.email = email
-        self.password = generate_password_hash(password)  # Hash the password
+        self.password = password  # Already hashed, see auth_hashing.hash_password
         self.age = age
         self.height = height
         self.weight = weight
         self.profile_picture = profile_picture
 
 class Workout(db.Model):
+    __table_args__ = (
+        db.Index('ix_workout_user_exercise', 'user_id', 'exercise_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    exercise = db.Column(db.String(100), nullable=False)
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), nullable=True)
+    exercise = db.Column(db.String(100), nullable=False)  # Canonical Exercise.name, kept for display
     sets = db.Column(db.Integer, nullable=False)
     reps = db.Column(db.Integer, nullable=False)
     weight = db.Column(db.Float, nullable=True)
     date = db.Column(db.DateTime, default=datetime.now())
 
     user = db.relationship('User', back_populates='workouts')
+    exercise_ref = db.relationship('Exercise')
 
     def __init__(self, user_id, date, exercise, sets, reps, weight=None):
         self.user_id = user_id
@@ -92,7 +105,9 @@ class Workout(db.Model):
 
     def to_dict(self):
         return {
+            'id': self.id,
             'date': self.date.strftime('%Y-%m-%d %H:%M:%S'),
+            'exercise_id': self.exercise_id,
             'exercise': self.exercise,
             'sets': self.sets,
             'reps': self.reps,
@@ -101,14 +116,131 @@ class Workout(db.Model):
 
 User.workouts = db.relationship('Workout', order_by=Workout.id, back_populates='user')
 
+class LeaderboardEntry(db.Model):
+    __tablename__ = 'leaderboard_entry'
+    __table_args__ = (
+        db.UniqueConstraint('exercise', 'metric', 'period', 'period_start', 'user_id', name='uq_leaderboard_entry'),
+        db.Index('ix_leaderboard_rank', 'exercise', 'metric', 'period', 'period_start', 'value'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    exercise = db.Column(db.String(100), nullable=False)
+    metric = db.Column(db.String(20), nullable=False)  # reps | volume | sessions
+    period = db.Column(db.String(10), nullable=False)  # day | week | all
+    period_start = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    value = db.Column(db.Float, nullable=False, default=0)
+
+LEADERBOARD_UPSERT_DIALECTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+def add_to_leaderboard(board, user_id, delta):
+    """Add ``delta`` to one leaderboard total, creating the row if needed.
+
+    One INSERT ... ON CONFLICT DO UPDATE, so two saves racing to create the
+    same row both land instead of one failing on uq_leaderboard_entry (and
+    taking its workout insert down with it).
+    """
+    exercise, metric, period, start = board
+    insert = LEADERBOARD_UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if insert is None:
+        # No upsert: atomic increment, insert if there was nothing to increment
+        match = LeaderboardEntry.query.filter_by(exercise=exercise, metric=metric, period=period,
+                                                 period_start=start, user_id=user_id)
+        if match.update({LeaderboardEntry.value: LeaderboardEntry.value + delta}, synchronize_session=False) == 0:
+            db.session.add(LeaderboardEntry(exercise=exercise, metric=metric, period=period,
+                                            period_start=start, user_id=user_id, value=delta))
+        return
+    table = LeaderboardEntry.__table__
+    statement = insert(table).values(exercise=exercise, metric=metric, period=period,
+                                     period_start=start, user_id=user_id, value=delta)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['exercise', 'metric', 'period', 'period_start', 'user_id'],
+        set_={'value': table.c.value + statement.excluded.value}))
+
+def bump_leaderboards(workout):
+    """Add ``workout`` to its leaderboard totals in the current transaction.
+
+    Returns ``(board, user_id, new_value)`` for each board touched so the
+    in-memory cache can be updated once the transaction commits.
+    """
+    when = workout.date or datetime.now()
+    updates = []
+    for metric, delta in workout_metrics(workout.sets, workout.reps, workout.weight).items():
+        for period in LEADERBOARD_PERIODS:
+            board = (workout.exercise, metric, period, period_start(period, when))
+            add_to_leaderboard(board, workout.user_id, delta)
+            updates.append(board)
+    db.session.flush()
+
+    totals = {(e.exercise, e.metric, e.period, e.period_start): e.value
+              for e in LeaderboardEntry.query.filter_by(user_id=workout.user_id, exercise=workout.exercise)
+              .filter(LeaderboardEntry.period_start.in_(list({board[3] for board in updates})))
+              .populate_existing()}
+    return [(board, workout.user_id, totals[board]) for board in updates if board in totals]
+
+def get_or_create_exercise(name):
+    """Return the Exercise for ``name``, folding case and spacing variants."""
+    key = exercise_key(name)
+    if not key:
+        raise ValueError('Missing exercise name')
+    exercise = Exercise.query.filter_by(name_key=key).first()
+    if exercise is None:
+        exercise = Exercise(name=' '.join(name.split()), name_key=key, description='', instructions='', tracking_points='[]')
+        db.session.add(exercise)
+        db.session.flush()
+    return exercise
+
+def save_workout(workout):
+    """Insert a workout and update the leaderboards in one transaction."""
+    exercise = get_or_create_exercise(workout.exercise)
+    workout.exercise_id = exercise.id
+    workout.exercise = exercise.name
+    db.session.add(workout)
+    updates = bump_leaderboards(workout)
+    db.session.commit()
+    for board, user_id, value in updates:
+        leaderboard_cache.offer(board, user_id, value)
+
+def load_leaderboard(board, k):
+    exercise, metric, period, start = board
+    rows = (db.session.query(LeaderboardEntry.user_id, LeaderboardEntry.value)
+            .filter_by(exercise=exercise, metric=metric, period=period, period_start=start)
+            .order_by(LeaderboardEntry.value.desc(), LeaderboardEntry.user_id)
+            .limit(k).all())
+    return [(user_id, value) for user_id, value in rows]
+
+leaderboard_cache = LeaderboardCache(load_leaderboard)
+
+def rebuild_leaderboards():
+    """Recompute every leaderboard total from the workout table."""
+    LeaderboardEntry.query.delete()
+    totals = {}
+    for workout in Workout.query.yield_per(1000):
+        when = workout.date or datetime.now()
+        for metric, delta in workout_metrics(workout.sets, workout.reps, workout.weight).items():
+            for period in LEADERBOARD_PERIODS:
+                key = (workout.exercise, metric, period, period_start(period, when), workout.user_id)
+                totals[key] = totals.get(key, 0) + delta
+    db.session.bulk_save_objects([
+        LeaderboardEntry(exercise=exercise, metric=metric, period=period, period_start=start,
+                         user_id=user_id, value=value)
+        for (exercise, metric, period, start, user_id), value in totals.items()
+    ])
+    db.session.commit()
+    leaderboard_cache.clear()
+
 
 
 class Exercise(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(100), nullable=False)
+    name_key = db.Column(db.String(100), nullable=False, unique=True)  # see search_index.exercise_key
     description = db.Column(db.Text, nullable=False)
     instructions = db.Column(db.Text, nullable=False)
     tracking_points = db.Column(db.String(200), nullable=False)  # JSON string of body points to track
+    # Catalogue entries shown on the exercise page; names that only come
+    # from logged workouts stay out of it
+    curated = db.Column(db.Boolean, nullable=False, default=False, server_default=sa.false())
 
     def to_dict(self):
         return {
@@ -119,8 +251,19 @@ class Exercise(db.Model):
             'tracking_points': self.tracking_points
         }
 
-# Global camera object
-camera = None
+FRAME_SLOTS = int(os.getenv('FRAME_SLOTS', '2'))
+
+class StreamState:
+    """What one socket's video stream owns: its frame reader, its pose
+    detector (with its own tier and buffers) and its flow control."""
+
+    def __init__(self, reader, detector):
+        self.reader = reader
+        self.detector = detector
+        self.flow = FrameFlowControl()
+
+# Running streams, keyed by socket id
+streams = {}
 
 @app.context_processor
 def inject_template_vars():
@@ -151,8 +294,7 @@ def workouts(exercise = None,sets=None,reps = 1,weight=5):
         user_id = session['user_id']
         if exercise and sets and reps and weight:
             new_workout = Workout(user_id=user_id, date=datetime.now(), exercise=exercise, sets=sets, reps=reps, weight=weight)
-            db.session.add(new_workout)
-            db.session.commit()
+            save_workout(new_workout)
 
             flash('Workout logged successfully')
             return redirect(url_for('workouts'))
@@ -164,8 +306,7 @@ def workouts(exercise = None,sets=None,reps = 1,weight=5):
             weight = request.form['weight'] if request.form['weight'] else None
 
             new_workout = Workout(user_id=user_id, date=datetime.now(), exercise=exercise, sets=sets, reps=reps, weight=weight)
-            db.session.add(new_workout)
-            db.session.commit()
+            save_workout(new_workout)
 
             flash('Workout logged successfully')
             return redirect(url_for('workouts'))
@@ -177,49 +318,13 @@ def workouts(exercise = None,sets=None,reps = 1,weight=5):
     else:
         return redirect(url_for('index'))
 
-@app.route('/download_workouts', methods=['GET'])
+@app.route('/download_workouts', methods=['GET', 'POST'])
 def download_workouts():
     if 'user_id' in session:
         user_id = session['user_id']
         workouts = Workout.query.filter_by(user_id=user_id).all()
-
-        # Create a file-like buffer to receive PDF data
-        buffer = io.BytesIO()
-
-        # Create the PDF object, using the buffer as its "file."
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        elements = []
-
-        # Table data
-        data = [["Date", "Exercise", "Sets", "Reps", "Weight"]]
-        for workout in workouts:
-            data.append([
-                workout.date.strftime('%Y-%m-%d %H:%M:%S'),
-                workout.exercise,
-                workout.sets,
-                workout.reps,
-                workout.weight if workout.weight is not None else "N/A"
-            ])
-
-        # Create the table
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        elements.append(table)
-
-        # Build the PDF
-        doc.build(elements)
-
-        # Return the PDF as a response
-        buffer.seek(0)
-        return send_file(buffer, as_attachment=True, download_name=f'workouts_{user_id}.pdf', mimetype='application/pdf')
+        rows = [workout.to_dict() for workout in workouts]
+        return enqueue_report('workouts', user_id, f'workouts_{user_id}.pdf', rows)
     else:
         return redirect(url_for('index'))
 
@@ -236,7 +341,11 @@ def login():
     if user:
         print("Stored hashed password:", user.password)  # Debug print
         print("Provided password:", password)  # Debug print
-        if check_password_hash(user.password, password):
+        if verify_password(user.password, password):
+            if needs_rehash(user.password):
+                # Upgrade hashes made with older cost parameters
+                user.password = hash_password(password)
+                db.session.commit()
             session['user_id'] = user.id
             flash('Login successful!')
             return redirect(url_for('info'))
@@ -260,7 +369,7 @@ def register():
         flash('Email already registered')
         return redirect(url_for('index'))
 
-    new_user = User(name=name, email=email, password=password, age=age, height=height, weight=weight)  # Password will be hashed in User model
+    new_user = User(name=name, email=email, password=hash_password(password), age=age, height=height, weight=weight)
     db.session.add(new_user)
     db.session.commit()
 
@@ -330,186 +439,290 @@ def update_diet():
 @socketio.on('connect')
 def handle_connect():
     print('Client connected')
+    if 'user_id' in session:
+        # Per-user room for notifications such as finished reports
+        join_room(f"user-{session['user_id']}")
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    global camera
     print('Client disconnected')
-    if camera is not None:
-        camera.release()
-        camera = None
+    # The stream loop notices and releases its reader and detector
+    streams.pop(request.sid, None)
+
+def handle_rep_event(event, exercise_name, weight=None):
+    """Forward a segmenter event to the client and save completed sets."""
+    if event['type'] == 'rep':
+        emit('rep-event', event)
+        return
+
+    event['saved'] = False
+    if 'user_id' in session and event['reps'] > 0:
+        try:
+            weight = float(weight) if weight not in (None, '') else None
+        except (TypeError, ValueError):
+            weight = None
+        try:
+            save_workout(Workout(user_id=session['user_id'], date=datetime.now(), exercise=exercise_name,
+                                 sets=1, reps=event['reps'], weight=weight))
+            event['saved'] = True
+        except Exception as e:
+            db.session.rollback()
+            print("Failed to save set:", repr(e))
+    try:
+        emit('set-complete', event)
+    except Exception as e:
+        # The client may already be gone when the stream ends
+        print("Failed to emit set-complete:", repr(e))
 
 @socketio.on('start-stream')
-def start_stream():
-    global camera
+def start_stream(data=None):
+    sid = request.sid
+    stream = reader = detector = None
+    recorder = None
+    segmenter = None
+    group = None
     try:
-        if camera is None:
-            camera = cv2.VideoCapture(0)
-            while True:
-                success, frame = camera.read()
-                if not success:
-                    print("Failed to grab frame")
-                    break
-
-                # Default rep_count to None
-                rep_count = None
-
-                # Process frame and attempt to extract rep count
+        if sid not in streams:
+            reader = ThreadedFrameReader(open_frame_source(), slots=FRAME_SLOTS).start()
+            exercise_name = (data or {}).get('exercise') or 'Dumbbell Curl'
+            weight = (data or {}).get('weight')
+            if (data or {}).get('mode') == 'group':
+                # Several trainees in one shot: per-person rep counts, nothing saved
+                detector = group = GroupPoseTracker(tier=POSE_QUALITY_TIER)
+            else:
+                detector = PoseDetector(tier=POSE_QUALITY_TIER)
+                segmenter = RepSegmenter()
+                if RECORD_LANDMARKS_DIR:
+                    os.makedirs(RECORD_LANDMARKS_DIR, exist_ok=True)
+                    recorder = LandmarkRecorder(recording_path(RECORD_LANDMARKS_DIR, session.get('user_id', 'guest')))
+            stream = streams[sid] = StreamState(reader, detector)
+            flow = stream.flow
+            quality_controller.register(sid, detector.tier)
+            emit('quality-tier', {'tier': detector.tier, **QUALITY_TIERS[detector.tier]})
+            while streams.get(sid) is stream:
+                # Capture runs on its own thread; never block the event loop here
+                frame = reader.read_latest()
+                if frame is None:
+                    if reader.ended:
+                        print("Failed to grab frame")
+                        break
+                    socketio.sleep(0.005)
+                    continue
+
+                # Process frame (draws the pose overlay and counts reps)
                 try:
-                    processed = pose_detector.process_frame(frame)
-
-                    # If process_frame returns (frame, rep_count)
-                    if isinstance(processed, tuple) and len(processed) == 2:
-                        frame, rep_count = processed
-
-                    # If process_frame returns dict {'frame':..., 'rep_count':...}
-                    elif isinstance(processed, dict):
-                        frame = processed.get('frame', frame)
-                        rep_count = processed.get('rep_count', None)
-
-                    # If it returns the processed frame only (numpy array)
-                    else:
-                        frame = processed
-
-                    # Fallback: check common attribute names on pose_detector
-                    if rep_count is None:
-                        for attr in ('rep_count', 'reps', 'counter', 'count'):
-                            if hasattr(pose_detector, attr):
-                                try:
-                                    rep_count = int(getattr(pose_detector, attr))
-                                    break
-                                except Exception:
-                                    rep_count = None
+                    started = time.perf_counter()
+                    frame = detector.process_frame(frame)
+                    new_tier = quality_controller.record(sid, (time.perf_counter() - started) * 1000,
+                                                         keyframe=detector.last_was_keyframe)
+                    if new_tier:
+                        detector.set_tier(new_tier)
+                        emit('quality-tier', {'tier': new_tier, **QUALITY_TIERS[new_tier]})
+
+                    if group is None:
+                        if recorder is not None:
+                            recorder.write(detector.last_landmarks)
+
+                        # Reps and sets go out as discrete events, only when they happen
+                        for event in segmenter.update(time.time(), detector.rep_counter.last_angle, detector.counter):
+                            handle_rep_event(event, exercise_name, weight)
 
                 except Exception as e:
                     # Log processing errors but continue
                     print("Pose processing error:", repr(e))
 
-                # Encode and emit the video frame
-                try:
-                    _, buffer = cv2.imencode('.jpg', frame)
-                    frame_bytes = base64.b64encode(buffer).decode('utf-8')
-                    emit('video-frame', {'frame': frame_bytes})
-                except Exception as e:
-                    print("Frame encoding error:", repr(e))
-
-                # Debug: log rep_count to server console so you can inspect it
-                try:
-                    print(f"[rep-debug] rep_count (server): {rep_count}")
-                except Exception:
-                    pass
+                # Out of credits: the client hasn't drawn what we sent yet,
+                # so skip encoding rather than queue more frames behind it.
+                # Keep the normal pacing; a slow client must not make us
+                # run inference faster than a healthy one does.
+                if not flow.can_send():
+                    socketio.sleep(0.1)
+                    continue
 
-                # Emit rep-count event — if None, emit zero so client still receives updates
+                # Encode and emit the video frame as a binary attachment
                 try:
-                    to_send = 0 if rep_count is None else int(rep_count)
-                    emit('rep-count', {'count': to_send})
+                    frame_bytes = detector.buffers.encode_jpeg(frame, flow.jpeg_quality)
+                    if frame_bytes is not None:
+                        payload = {'frame': frame_bytes, 'seq': flow.next_seq()}
+                        if group is not None:
+                            # Everyone's state rides on the frame, under the same credits
+                            payload['people'] = group.state()
+                        emit('video-frame', payload)
                 except Exception as e:
-                    print("Failed to emit rep-count:", repr(e))
+                    print("Frame encoding error:", repr(e))
 
                 socketio.sleep(0.1)  # small delay
 
-
-            
     except Exception as e:
         print(f"Error in video stream: {str(e)}")
         print(f"Error details:", e.__class__.__name__)
         import traceback
         traceback.print_exc()
     finally:
-        if camera is not None:
-            camera.release()
-            camera = None
+        if segmenter is not None:
+            for event in segmenter.finish(time.time()):
+                handle_rep_event(event, exercise_name, weight)
+        if recorder is not None:
+            recorder.close()
+        if stream is not None:
+            quality_controller.unregister(sid)
+            if streams.get(sid) is stream:
+                del streams[sid]
+        if reader is not None:
+            reader.release()
+        if detector is not None:
+            detector.close()
+
+@socketio.on('frame-ack')
+def frame_ack(data=None):
+    stream = streams.get(request.sid)
+    if stream is not None and data:
+        stream.flow.on_ack(data.get('seq'))
 
 @app.route('/exercise')
 def exercise():
     if 'user_id' not in session:
         return redirect(url_for('login'))
         
-    exercises = Exercise.query.all()
+    exercises = Exercise.query.filter_by(curated=True).all()
     return render_template('exercise.html', exercises=exercises)
 
 @app.route('/api/exercises')
 def get_exercises():
-    exercises = Exercise.query.all()
+    exercises = Exercise.query.filter_by(curated=True).all()
     return jsonify([exercise.to_dict() for exercise in exercises])
 
-@app.route('/generate_pdf')
+@app.route('/api/search')
+def search():
+    q = request.args.get('q', '')
+    result = {
+        'exercises': [{'id': exercise_id, 'name': name} for exercise_id, name in search_exercises(db.session, q, curated=True)],
+        'workouts': [],
+    }
+    if 'user_id' in session:
+        ids = search_workouts(db.session, session['user_id'], q)
+        if ids:
+            order = {workout_id: i for i, workout_id in enumerate(ids)}
+            workouts = Workout.query.filter(Workout.id.in_(ids)).all()
+            result['workouts'] = [w.to_dict() for w in sorted(workouts, key=lambda w: order[w.id])]
+    return jsonify(result)
+
+@app.route('/api/leaderboard')
+def leaderboard():
+    exercise = request.args.get('exercise', 'Dumbbell Curl')
+    metric = request.args.get('metric', 'reps')
+    period = request.args.get('period', 'week')
+    if metric not in LEADERBOARD_METRICS:
+        return jsonify({'error': f'metric must be one of {", ".join(LEADERBOARD_METRICS)}'}), 400
+    if period not in LEADERBOARD_PERIODS:
+        return jsonify({'error': f'period must be one of {", ".join(LEADERBOARD_PERIODS)}'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), leaderboard_cache.k))
+    except ValueError:
+        limit = 10
+
+    known = Exercise.query.filter_by(name_key=exercise_key(exercise)).first()
+    if known is not None:
+        exercise = known.name
+    start = period_start(period, datetime.now())
+    board = (exercise, metric, period, start)
+    top = leaderboard_cache.top(board)[:limit]
+    names = dict(db.session.query(User.id, User.name).filter(User.id.in_([user_id for user_id, _ in top])).all())
+
+    result = {
+        'exercise': exercise,
+        'metric': metric,
+        'period': period,
+        'period_start': start.isoformat(),
+        'rankings': [{'rank': i + 1, 'user_id': user_id, 'name': names.get(user_id), 'value': value}
+                     for i, (user_id, value) in enumerate(top)],
+        'me': None,
+    }
+
+    if 'user_id' in session:
+        mine = leaderboard_cache.rank(board, session['user_id'])
+        if mine is not None:
+            rank, value = mine
+            result['me'] = {'rank': rank, 'value': value}
+
+    return jsonify(result)
+
+@app.route('/generate_pdf', methods=['GET', 'POST'])
 def generate_pdf():
     if 'user_id' in session:
         user = User.query.filter_by(id=session['user_id']).first()
-        bmi = round(user.weight / ((user.height / 100) ** 2), 2)
-
-        # Create a file-like buffer to receive PDF data
-        buffer = io.BytesIO()
-
-        # Create the PDF object, using the buffer as its "file."
-        pdf = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-
-        # Draw the user data on the PDF
-        pdf.drawString(100, height - 100, f"Name: {user.name}")
-        pdf.drawString(100, height - 120, f"Email: {user.email}")
-        pdf.drawString(100, height - 140, f"Age: {user.age}")
-        pdf.drawString(100, height - 160, f"Height: {user.height} cm")
-        pdf.drawString(100, height - 180, f"Weight: {user.weight} kg")
-        pdf.drawString(100, height - 200, f"BMI: {bmi}")
-
-        # Determine BMI status
-        if bmi < 19:
-            bmi_status = "Underweight"
-            diet_suggestions = [
-                "Eat more frequently. Have 5-6 small meals throughout the day.",
-                "Include nutrient-rich foods in your diet, such as whole grains, lean proteins, and healthy fats.",
-                "Drink high-calorie smoothies and shakes.",
-                "Snack on nuts, seeds, and dried fruits.",
-                "Stay hydrated and avoid skipping meals."
-            ]
-        elif bmi >= 19 and bmi <= 25:
-            bmi_status = "Normal"
-            diet_suggestions = [
-                "Maintain a balanced diet with a variety of foods from all food groups.",
-                "Eat plenty of fruits and vegetables.",
-                "Include lean proteins, whole grains, and healthy fats in your meals.",
-                "Stay hydrated by drinking plenty of water.",
-                "Avoid sugary drinks and excessive junk food."
-            ]
-        else:
-            bmi_status = "Overweight"
-            diet_suggestions = [
-                "Eat more fruits and vegetables.",
-                "Choose whole grains over refined grains.",
-                "Include lean proteins, such as chicken, fish, beans, and legumes.",
-                "Avoid sugary drinks and opt for water or herbal teas.",
-                "Reduce your intake of high-calorie, low-nutrient foods.",
-                "Practice portion control and avoid eating late at night."
-            ]
-
-        pdf.drawString(100, height - 220, f"BMI Status: {bmi_status}")
-        pdf.drawString(100, height - 240, "Diet Suggestions:")
-
-        y = height - 260
-        for suggestion in diet_suggestions:
-            pdf.drawString(120, y, f"- {suggestion}")
-            y -= 20
-
-        # Close the PDF object cleanly
-        pdf.showPage()
-        pdf.save()
-
-        # Get the value of the BytesIO buffer and write it to the response
-        buffer.seek(0)
-        return send_file(buffer, as_attachment=True, download_name='diet_plan.pdf', mimetype='application/pdf')
+        payload = {
+            'name': user.name,
+            'email': user.email,
+            'age': user.age,
+            'height': user.height,
+            'weight': user.weight,
+        }
+        return enqueue_report('diet', user.id, 'diet_plan.pdf', payload)
     else:
         return redirect(url_for('index'))
 
+def enqueue_report(kind, user_id, filename, payload):
+    global report_notifier
+    if report_notifier is None:
+        report_notifier = socketio.start_background_task(send_report_notifications)
+    try:
+        job = report_jobs.submit(kind, user_id, filename, payload)
+    except ReportQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    if job.status == 'error':
+        return jsonify(job.to_dict()), 500
+    return jsonify(job.to_dict()), 202
+
+# Jobs finish on the process pool's manager thread, a native OS thread when
+# the hub isn't monkey-patched (python app.py); socket writes must happen on
+# the hub, so the thread only queues the job and a background task emits
+finished_reports = deque()
+report_notifier = None
+
+def notify_report_finished(job):
+    finished_reports.append(job)
+
+def send_report_notifications():
+    while True:
+        while finished_reports:
+            job = finished_reports.popleft()
+            try:
+                socketio.emit('report-ready', job.to_dict(), to=f'user-{job.user_id}')
+            except Exception as e:
+                print("Report notification error:", repr(e))
+        socketio.sleep(0.2)
+
+report_jobs = ReportJobs(on_finished=notify_report_finished)
+
+@app.route('/reports/<job_id>')
+def report_status(job_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    job = report_jobs.get(job_id, session['user_id'])
+    if job is None:
+        return jsonify({'error': 'Unknown report'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/reports/<job_id>/download')
+def report_download(job_id):
+    if 'user_id' not in session:
+        return redirect(url_for('index'))
+    job = report_jobs.get(job_id, session['user_id'])
+    if job is None:
+        return jsonify({'error': 'Unknown report'}), 404
+    if job.status != 'done':
+        return jsonify(job.to_dict()), 409
+    return send_file(io.BytesIO(job.pdf), as_attachment=True, download_name=job.filename, mimetype='application/pdf')
+
 @app.route('/nearest_gym')
 def nearest_gym():
     api_key = os.getenv('GOOGLE_MAPS_API_KEY')
     return render_template('nearest_gym.html', api_key=api_key)
 
 def init_exercises():
-    # Check if exercises already exist
-    if Exercise.query.count() > 0:
+    # Check if the catalogue already exists
+    if Exercise.query.filter_by(curated=True).count() > 0:
         return
 
     exercises = [
@@ -549,14 +762,42 @@ def init_exercises():
     ]
 
     for exercise_data in exercises:
-        exercise = Exercise(**exercise_data)
-        db.session.add(exercise)
+        # A workout may already have created the row; promote it, keeping its name
+        key = exercise_key(exercise_data['name'])
+        exercise = Exercise.query.filter_by(name_key=key).first()
+        if exercise is None:
+            exercise = Exercise(name=exercise_data['name'], name_key=key)
+            db.session.add(exercise)
+        exercise.description = exercise_data['description']
+        exercise.instructions = exercise_data['instructions']
+        exercise.tracking_points = exercise_data['tracking_points']
+        exercise.curated = True
     
     db.session.commit()
 
-with app.app_context():
-    db.create_all()
+def init_leaderboards():
+    # Backfill the summary table the first time it exists alongside old workouts
+    if LeaderboardEntry.query.first() is None and Workout.query.first() is not None:
+        rebuild_leaderboards()
+
+def init_database():
+    """Migrate the schema to head, then seed exercises, leaderboards and search."""
+    inspector = sa.inspect(db.engine)
+    if inspector.has_table('workout') and not inspector.has_table('alembic_version'):
+        # Tables built by db.create_all() before migrations ran on deploy
+        stamp(revision='cc5d5782e8f1')
+    upgrade()
     init_exercises()
+    init_leaderboards()
+    ensure_search_index(db.session)
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Apply migrations and seed the database."""
+    init_database()
+
+with app.app_context():
+    install_sqlite_pragmas(db.engine)
 
 
 
@@ -607,8 +848,7 @@ def save_using_automatic():
 
         # Create and persist the Workout
         new_workout = Workout(user_id=user_id, date=datetime.now(), exercise=exercise_name, sets=sets, reps=reps, weight=weight)
-        db.session.add(new_workout)
-        db.session.commit()
+        save_workout(new_workout)
 
         return jsonify({'success': True, 'message': 'Workout saved', 'workout': new_workout.to_dict()}), 200
 
@@ -622,7 +862,6 @@ def save_using_automatic():
 
 
 if __name__ == '__main__':
-    # with app.app_context():
-    #     db.create_all()
-    #     init_exercises()  # Initialize exercises
+    with app.app_context():
+        init_database()
     socketio.run(app, host='0.0.0.0', port=10000, debug=True, allow_unsafe_werkzeug=True)
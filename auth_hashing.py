@@ -0,0 +1,57 @@
+# auth_hashing.py
+"""Password hashing that stays off the event loop.
+
+Werkzeug's hashes are deliberately slow. Run inline on the single eventlet
+worker, a burst of logins would freeze every video stream, so hashing and
+verification go to native threads (``eventlet.tpool`` when eventlet is
+installed, a plain thread pool otherwise). A semaphore caps how many run
+at once; under eventlet it is a green one, so waiters yield to the hub.
+
+    PASSWORD_HASH_METHOD   werkzeug method string, e.g. "scrypt:32768:8:1"
+                           or "pbkdf2:sha256:600000" (default "scrypt")
+    PASSWORD_HASH_WORKERS  concurrent hashes (default 2)
+"""
+import os
+from werkzeug.security import generate_password_hash, check_password_hash
+
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+
+# Whenever eventlet is installed the app is served from its hub, patched or
+# not (``python app.py`` doesn't monkey-patch), so waiting must yield to it
+try:
+    from eventlet import semaphore, tpool
+except ImportError:
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    tpool = None
+    _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='auth-hash')
+    _slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS)
+else:
+    _slots = semaphore.BoundedSemaphore(PASSWORD_HASH_WORKERS)
+_method_prefix = None
+
+
+def _offload(func, *args, **kwargs):
+    with _slots:
+        if tpool is not None:
+            return tpool.execute(func, *args, **kwargs)
+        return _executor.submit(func, *args, **kwargs).result()
+
+
+def hash_password(password):
+    return _offload(generate_password_hash, password, method=PASSWORD_HASH_METHOD)
+
+
+def verify_password(stored_hash, password):
+    return _offload(check_password_hash, stored_hash, password)
+
+
+def needs_rehash(stored_hash):
+    """True when ``stored_hash`` was made with different parameters than
+    ``PASSWORD_HASH_METHOD`` currently produces."""
+    global _method_prefix
+    if _method_prefix is None:
+        # Werkzeug fills in default parameters, so read them off a real hash
+        _method_prefix = hash_password('').split('$', 1)[0]
+    return stored_hash.split('$', 1)[0] != _method_prefix
@@ -0,0 +1,143 @@
+"""Database contention benchmark.
+
+Runs N writer threads inserting workout-shaped rows and M reader threads
+running history queries against the same database. It runs once with
+SQLAlchemy defaults and once with the settings from ``database.py``
+(WAL, busy_timeout, synchronous=NORMAL, mmap, sized pool), then prints
+throughput, "database is locked" errors and latency percentiles for each.
+
+    python benchmarks/db_contention.py --writers 8 --readers 8 --seconds 10
+    python benchmarks/db_contention.py --url postgresql://fittab@localhost/fittab_bench
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from database import engine_options, install_sqlite_pragmas, normalize_url  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bench_workout (
+    id INTEGER PRIMARY KEY {autoincrement},
+    user_id INTEGER NOT NULL,
+    exercise VARCHAR(100) NOT NULL,
+    sets INTEGER NOT NULL,
+    reps INTEGER NOT NULL,
+    weight FLOAT,
+    date TIMESTAMP NOT NULL
+)
+"""
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(pct / 100.0 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def make_engine(url, tuned):
+    if not tuned:
+        return create_engine(url)
+    engine = create_engine(url, **engine_options(url))
+    install_sqlite_pragmas(engine)
+    return engine
+
+
+def run(url, tuned, writers, readers, seconds, users):
+    engine = make_engine(url, tuned)
+    autoincrement = 'AUTOINCREMENT' if engine.dialect.name == 'sqlite' else ''
+    if engine.dialect.name == 'postgresql':
+        schema = SCHEMA.replace('INTEGER PRIMARY KEY {autoincrement}', 'SERIAL PRIMARY KEY')
+    else:
+        schema = SCHEMA.format(autoincrement=autoincrement)
+    with engine.begin() as conn:
+        conn.execute(text('DROP TABLE IF EXISTS bench_workout'))
+        conn.execute(text(schema))
+        conn.execute(text('CREATE INDEX ix_bench_workout_user ON bench_workout (user_id)'))
+
+    lock = threading.Lock()
+    results = {'write': [], 'read': []}
+    errors = {'write': 0, 'read': 0}
+    deadline = time.perf_counter() + seconds
+
+    def record(kind, started, ok):
+        with lock:
+            if ok:
+                results[kind].append(time.perf_counter() - started)
+            else:
+                errors[kind] += 1
+
+    def writer(index):
+        i = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(
+                        'INSERT INTO bench_workout (user_id, exercise, sets, reps, weight, date) '
+                        'VALUES (:user_id, :exercise, 3, 12, 5.0, :date)'),
+                        {'user_id': (index * 7919 + i) % users, 'exercise': 'Dumbbell Curl', 'date': datetime.now()})
+                record('write', started, True)
+            except OperationalError:
+                record('write', started, False)
+            i += 1
+
+    def reader(index):
+        i = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text('SELECT * FROM bench_workout WHERE user_id = :user_id ORDER BY id'),
+                                 {'user_id': (index * 104729 + i) % users}).fetchall()
+                record('read', started, True)
+            except OperationalError:
+                record('read', started, False)
+            i += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    label = 'tuned' if tuned else 'default'
+    for kind in ('write', 'read'):
+        samples = sorted(results[kind])
+        print(f"{label:<8}{kind:<7}{len(samples) / seconds:>9.1f}/s{errors[kind]:>8} locked"
+              f"{percentile(samples, 50) * 1000:>9.2f}{percentile(samples, 99) * 1000:>10.2f}"
+              f"{(samples[-1] if samples else 0) * 1000:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='database URL (default: a temporary SQLite file)')
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--users', type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'config':<8}{'op':<7}{'throughput':>11}{'errors':>15}{'p50 ms':>9}{'p99 ms':>10}{'max ms':>10}")
+    for tuned in (False, True):
+        if args.url:
+            url = normalize_url(args.url)
+            run(url, tuned, args.writers, args.readers, args.seconds, args.users)
+        else:
+            with tempfile.TemporaryDirectory() as tmp:
+                url = f"sqlite:///{os.path.join(tmp, 'bench.sqlite3')}"
+                run(url, tuned, args.writers, args.readers, args.seconds, args.users)
+
+
+if __name__ == '__main__':
+    main()
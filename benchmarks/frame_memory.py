@@ -0,0 +1,146 @@
+"""Frame pipeline memory benchmark.
+
+Pushes synthetic frames for N concurrent sessions through the per-frame
+pipeline of ``start_stream`` and reports, per pipeline, the memory
+allocated inside each frame (tracemalloc high-water mark above the
+steady-state level), the memory still held between frames, and the peak
+RSS of the process. Each pipeline runs in its own process so peak RSS is
+not shared:
+
+* ``legacy``: fresh arrays per stage (RGB and back to BGR, grayscale,
+  base64 JPEG), as the stream loop used to do;
+* ``pooled``: ``FrameBuffers`` destinations and binary JPEG bytes.
+
+MediaPipe's own allocations are left out unless ``--pose`` is given.
+
+    python benchmarks/frame_memory.py --sessions 1 8 32 --frames 300
+    python benchmarks/frame_memory.py --sessions 4 --pose
+"""
+import argparse
+import base64
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from frame_buffers import FrameBuffers  # noqa: E402
+from frame_sources import SyntheticSource  # noqa: E402
+
+INFER_WIDTH = 640
+FLOW_WIDTH = 320
+JPEG_QUALITY = 80
+
+
+class LegacySession:
+    def __init__(self, width, height, pose):
+        self.source = SyntheticSource(width, height, fps=0)
+        self.pose = pose
+
+    def step(self, frame):
+        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        small = image
+        if image.shape[1] > INFER_WIDTH:
+            small = cv2.resize(image, (INFER_WIDTH, image.shape[0] * INFER_WIDTH // image.shape[1]),
+                               interpolation=cv2.INTER_AREA)
+        if self.pose is not None:
+            self.pose.process(small)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        cv2.resize(gray, (FLOW_WIDTH, gray.shape[0] * FLOW_WIDTH // gray.shape[1]), interpolation=cv2.INTER_AREA)
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        return base64.b64encode(buffer).decode('utf-8')
+
+
+class PooledSession:
+    def __init__(self, width, height, pose):
+        self.source = SyntheticSource(width, height, fps=0)
+        self.pose = pose
+        self.buffers = FrameBuffers()
+        self.index = 0
+
+    def step(self, frame):
+        small = self.buffers.resize('infer', frame, INFER_WIDTH)
+        rgb = self.buffers.convert('rgb', small, cv2.COLOR_BGR2RGB, 3)
+        if self.pose is not None:
+            self.pose.process(rgb)
+        small = self.buffers.resize('flow', frame, FLOW_WIDTH)
+        self.buffers.convert(f'gray{self.index % 2}', small, cv2.COLOR_BGR2GRAY, 1)
+        self.index += 1
+        return self.buffers.encode_jpeg(frame, JPEG_QUALITY)
+
+
+PIPELINES = {'legacy': LegacySession, 'pooled': PooledSession}
+
+
+def run(pipeline, sessions, frames, width, height, use_pose, results):
+    pose = None
+    if use_pose:
+        import mediapipe as mp
+        pose = lambda: mp.solutions.pose.Pose(model_complexity=0)  # noqa: E731
+    workers = [PIPELINES[pipeline](width, height, pose() if pose else None) for _ in range(sessions)]
+    images = [None] * sessions
+
+    # Warm up so buffer creation isn't counted as churn (two frames: the
+    # grayscale buffers alternate)
+    for _ in range(2):
+        for i, worker in enumerate(workers):
+            _, images[i] = worker.source.read(images[i])
+            worker.step(images[i])
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    transient = 0
+    started = time.perf_counter()
+    for n in range(frames * sessions):
+        i = n % sessions
+        _, images[i] = workers[i].source.read(images[i])
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        workers[i].step(images[i])
+        transient += tracemalloc.get_traced_memory()[1] - current
+    elapsed = time.perf_counter() - started
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        maxrss //= 1024
+    results.put({
+        'transient_kb': transient / (frames * sessions) / 1024,
+        'retained_kb': retained / 1024,
+        'fps': frames * sessions / elapsed,
+        'maxrss_mb': maxrss / 1024,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--frames', type=int, default=200, help='frames per session')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--pose', action='store_true', help='include MediaPipe inference')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    print(f"{'pipeline':<10}{'sessions':>9}{'KB/frame':>10}{'retained KB':>13}{'frames/s':>10}{'peak RSS MB':>13}")
+    for sessions in args.sessions:
+        for pipeline in PIPELINES:
+            results = context.Queue()
+            process = context.Process(target=run, args=(pipeline, sessions, args.frames, args.width,
+                                                         args.height, args.pose, results))
+            process.start()
+            result = results.get()
+            process.join()
+            print(f"{pipeline:<10}{sessions:>9}{result['transient_kb']:>10.1f}{result['retained_kb']:>13.1f}"
+                  f"{result['fps']:>10.1f}{result['maxrss_mb']:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
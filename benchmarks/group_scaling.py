@@ -0,0 +1,108 @@
+"""Group-class mode scaling benchmark.
+
+Builds group frames by tiling a recorded single-person clip side by side
+``N`` times, then runs them through ``GroupPoseTracker`` and reports, for
+each ``N``, how many people were tracked, the time spent in person
+detection and in everything else (mostly per-person pose inference), and
+the overall frames per second. The single-person ``PoseDetector`` on the
+untiled clip is the baseline.
+
+    python benchmarks/group_scaling.py clips/curl.mp4 --people 1 2 4 8 --frames 150
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from dumbel_curl_script import PoseDetector  # noqa: E402
+from frame_sources import VideoFileSource  # noqa: E402
+from group_tracking import GroupPoseTracker  # noqa: E402
+
+
+def load_frames(path, count, tile_width):
+    """Up to ``count`` frames of ``path``, each scaled to ``tile_width`` wide."""
+    source = VideoFileSource(path, loop=True, realtime=False)
+    if not source.isOpened():
+        raise SystemExit(f"Cannot open {path}")
+    frames = []
+    try:
+        while len(frames) < count:
+            success, frame = source.read()
+            if not success:
+                break
+            height = int(frame.shape[0] * tile_width / frame.shape[1])
+            frames.append(cv2.resize(frame, (tile_width, height), interpolation=cv2.INTER_AREA))
+    finally:
+        source.release()
+    return frames
+
+
+class TimedDetector:
+    """Wraps a detector's ``detect`` to accumulate the time spent in it."""
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.seconds = 0.0
+
+    def detect(self, frame):
+        started = time.perf_counter()
+        try:
+            return self.detector.detect(frame)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+
+def run_single(frames):
+    detector = PoseDetector()
+    started = time.perf_counter()
+    for frame in frames:
+        detector.process_frame(frame.copy())
+    elapsed = time.perf_counter() - started
+    detector.pose.close()
+    return elapsed
+
+
+def run_group(frames, people, detect_interval):
+    tracker = GroupPoseTracker(detect_interval=detect_interval, max_people=max(people, 1))
+    timed = tracker.detector = TimedDetector(tracker.detector)
+    tracked = []
+    started = time.perf_counter()
+    for frame in frames:
+        tracker.process_frame(np.hstack([frame] * people))
+        tracked.append(len(tracker.tracker.tracks))
+    elapsed = time.perf_counter() - started
+    tracker.close()
+    return elapsed, timed.seconds, float(np.mean(tracked)) if tracked else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('clip', help='recorded single-person clip')
+    parser.add_argument('--people', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--frames', type=int, default=150)
+    parser.add_argument('--tile-width', type=int, default=320)
+    parser.add_argument('--detect-interval', type=int, default=5)
+    args = parser.parse_args()
+
+    frames = load_frames(args.clip, args.frames, args.tile_width)
+    if not frames:
+        raise SystemExit(f"No frames in {args.clip}")
+
+    elapsed = run_single(frames)
+    print(f"single-person baseline: {len(frames) / elapsed:.1f} fps\n")
+    print(f"{'people':>7}{'tracked':>9}{'fps':>8}{'ms/frame':>10}{'detect ms':>11}{'pose ms':>9}{'ms/person':>11}")
+    for people in args.people:
+        elapsed, detect_seconds, tracked = run_group(frames, people, args.detect_interval)
+        per_frame = elapsed * 1000 / len(frames)
+        detect_ms = detect_seconds * 1000 / len(frames)
+        pose_ms = per_frame - detect_ms
+        print(f"{people:>7}{tracked:>9.1f}{len(frames) / elapsed:>8.1f}{per_frame:>10.1f}{detect_ms:>11.1f}"
+              f"{pose_ms:>9.1f}{pose_ms / max(tracked, 1):>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Keyframe tracking accuracy and throughput benchmark.
+
+Runs each recorded clip through ``PoseDetector`` once with full inference on
+every frame (the reference) and once per keyframe interval, where MediaPipe
+only runs on keyframes and optical flow tracks the joints in between. For
+each run it prints frames per second, the share of frames that needed
+inference, the curl-arm landmark error against the reference, the elbow
+angle error and the rep count.
+
+    python benchmarks/keyframe_accuracy.py clips/curl.mp4 --intervals 2 3 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from dumbel_curl_script import LEFT_ELBOW, LEFT_SHOULDER, LEFT_WRIST, PoseDetector  # noqa: E402
+from frame_sources import VideoFileSource  # noqa: E402
+
+ARM = [LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST]
+
+
+def run_clip(path, tier, interval):
+    """Process every frame of ``path``; returns per-frame landmarks, angles and stats."""
+    source = VideoFileSource(path, loop=False, realtime=False)
+    if not source.isOpened():
+        raise SystemExit(f"Cannot open {path}")
+    detector = PoseDetector(tier=tier, keyframe_interval=interval)
+    landmarks, angles = [], []
+    size = None
+    elapsed = 0.0
+    try:
+        while True:
+            success, frame = source.read()
+            if not success:
+                break
+            size = frame.shape[1], frame.shape[0]
+            started = time.perf_counter()
+            detector.process_frame(frame)
+            elapsed += time.perf_counter() - started
+            landmarks.append(None if detector.last_landmarks is None else detector.last_landmarks.copy())
+            angles.append(detector.rep_counter.last_angle)
+    finally:
+        source.release()
+        detector.pose.close()
+    return {
+        'landmarks': landmarks, 'angles': angles, 'size': size, 'elapsed': elapsed,
+        'reps': detector.counter, 'keyframes': detector.keyframes,
+    }
+
+
+def compare(reference, run):
+    """Mean arm-joint error in pixels and mean elbow-angle error in degrees."""
+    scale = np.array(reference['size'], dtype=np.float32)
+    joint_errors, angle_errors = [], []
+    for ref, got in zip(reference['landmarks'], run['landmarks']):
+        if ref is not None and got is not None:
+            joint_errors.append(np.linalg.norm((ref[ARM, :2] - got[ARM, :2]) * scale, axis=1).mean())
+    for ref, got in zip(reference['angles'], run['angles']):
+        if ref is not None and got is not None:
+            angle_errors.append(abs(ref - got))
+    mean = lambda values: float(np.mean(values)) if values else float('nan')  # noqa: E731
+    return mean(joint_errors), mean(angle_errors)
+
+
+def report(label, run, reference):
+    frames = len(run['landmarks'])
+    fps = frames / run['elapsed'] if run['elapsed'] else 0.0
+    joint_error, angle_error = compare(reference, run)
+    print(f"{label:<12}{frames:>8}{fps:>9.1f}{100.0 * run['keyframes'] / max(frames, 1):>11.1f}"
+          f"{joint_error:>11.2f}{angle_error:>11.2f}{run['reps']:>6}{reference['reps']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('clips', nargs='+', help='recorded video clips')
+    parser.add_argument('--intervals', type=int, nargs='+', default=[2, 3, 5])
+    parser.add_argument('--tier', default='medium')
+    args = parser.parse_args()
+
+    for path in args.clips:
+        print(f"\n{path}")
+        print(f"{'interval':<12}{'frames':>8}{'fps':>9}{'keyframe%':>11}{'joint px':>11}"
+              f"{'angle deg':>11}{'reps':>6}{'ref':>6}")
+        reference = run_clip(path, args.tier, 1)
+        report('full', reference, reference)
+        for interval in args.intervals:
+            report(f'k={interval}', run_clip(path, args.tier, interval), reference)
+
+
+if __name__ == '__main__':
+    main()
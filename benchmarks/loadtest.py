@@ -0,0 +1,201 @@
+"""End-to-end load test for FitTab.
+
+Simulates N users that each register, log in, open /workouts, save a workout
+with /save_using_automatic, watch the exercise stream over Socket.IO and ask
+the chatbot a question. Prints throughput, error rate and latency
+percentiles per endpoint and per socket event.
+
+Run the server with the fake backends so no webcam or Gemini key is needed:
+
+    FRAME_SOURCE=clips/curl.mp4 CHATBOT_BACKEND=fake SESSION_COOKIE_SECURE=0 python app.py
+    python benchmarks/loadtest.py --url http://localhost:10000 --users 20 --iterations 3
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import socketio
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name, seconds, ok=True):
+        with self.lock:
+            self.samples[name].append(seconds)
+            if not ok:
+                self.errors[name] += 1
+
+    def timed(self, name, func, *args, check=None, **kwargs):
+        """Time ``func``; ``check(response)`` decides success (default: status < 400)."""
+        started = time.perf_counter()
+        try:
+            response = func(*args, **kwargs)
+        except Exception:
+            self.record(name, time.perf_counter() - started, ok=False)
+            raise
+        ok = check(response) if check is not None else response.status_code < 400
+        self.record(name, time.perf_counter() - started, ok=ok)
+        return response
+
+    def report(self, elapsed):
+        print(f"{'name':<32}{'count':>7}{'err%':>7}{'rps':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        for name in sorted(self.samples):
+            samples = sorted(self.samples[name])
+            count = len(samples)
+            error_pct = 100.0 * self.errors[name] / count
+            print(f"{name:<32}{count:>7}{error_pct:>7.1f}{count / elapsed:>8.1f}"
+                  f"{percentile(samples, 50) * 1000:>9.1f}{percentile(samples, 90) * 1000:>9.1f}"
+                  f"{percentile(samples, 99) * 1000:>9.1f}{samples[-1] * 1000:>9.1f}")
+
+
+def logged_in(response):
+    # /login answers 302 either way: /info on success, back to / on failure
+    return response.status_code == 302 and response.headers.get('Location', '').endswith('/info')
+
+
+def registered(response):
+    # /register redirects to / either way; only a failure flashes a message,
+    # which is what writes the session cookie
+    return response.status_code == 302 and 'session=' not in response.headers.get('Set-Cookie', '')
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(pct / 100.0 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def ack_frame(client, data):
+    """Ack a video frame like the browser does once it has drawn it.
+
+    The server keeps only STREAM_MAX_UNACKED frames in flight; a client
+    that never acks gets one frame per STREAM_ACK_TIMEOUT_SECONDS.
+    """
+    client.emit('frame-ack', {'seq': data.get('seq')})
+
+
+def watch_stream(args, http, stats):
+    """Connect with the user's session cookie, start the stream and time frames."""
+    client = socketio.Client(reconnection=False)
+    frames = []
+    done = threading.Event()
+    started = time.perf_counter()
+
+    @client.on('video-frame')
+    def on_frame(data):
+        now = time.perf_counter()
+        name = 'socket video-frame (first)' if not frames else 'socket video-frame (gap)'
+        stats.record(name, now - (frames[-1] if frames else started))
+        frames.append(now)
+        ack_frame(client, data)
+        if len(frames) >= args.frames:
+            done.set()
+
+    @client.on('rep-event')
+    def on_rep_event(data):
+        stats.record('socket rep-event', 0.0)
+
+    @client.on('set-complete')
+    def on_set_complete(data):
+        stats.record('socket set-complete', 0.0, ok=data.get('saved', False))
+
+    cookie = '; '.join(f'{c.name}={c.value}' for c in http.cookies)
+    connect_started = time.perf_counter()
+    try:
+        client.connect(args.url, headers={'Cookie': cookie}, wait_timeout=10)
+    except Exception:
+        stats.record('socket connect', time.perf_counter() - connect_started, ok=False)
+        return
+    stats.record('socket connect', time.perf_counter() - connect_started)
+
+    started = time.perf_counter()
+    client.emit('start-stream', {'exercise': 'Dumbbell Curl'})
+    if not done.wait(args.stream_timeout):
+        stats.record('socket stream timeout', time.perf_counter() - started, ok=False)
+    client.disconnect()
+
+
+def ask_chatbot(args, http, stats):
+    started = time.perf_counter()
+    response = stats.timed('POST /chatbot/chat', http.post, f'{args.url}/chatbot/chat',
+                           json={'message': 'Give me a short arm workout'})
+    if response.status_code != 202:
+        return
+    stream_url = response.json()['stream_url']
+    first_chunk = None
+    ok = False
+    with http.get(f'{args.url}{stream_url}', stream=True, timeout=args.chat_timeout) as stream:
+        for line in stream.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data: '):
+                continue
+            data = json.loads(line[len('data: '):])
+            if first_chunk is None and data.get('response'):
+                first_chunk = time.perf_counter()
+                stats.record('chat first chunk', first_chunk - started)
+            if data['status'] in ('done', 'error'):
+                ok = data['status'] == 'done'
+                break
+    stats.record('chat full answer', time.perf_counter() - started, ok=ok)
+
+
+def simulate_user(args, stats, index):
+    http = requests.Session()
+    email = f'load-{uuid.uuid4().hex[:12]}@example.com'
+    password = 'load-test-password'
+
+    stats.timed('POST /register', http.post, f'{args.url}/register', data={
+        'name': f'Load User {index}', 'email': email, 'password': password,
+        'age': 30, 'height': 175, 'weight': 70,
+    }, allow_redirects=False, check=registered)
+
+    for _ in range(args.iterations):
+        stats.timed('POST /login', http.post, f'{args.url}/login',
+                    data={'email': email, 'password': password}, allow_redirects=False, check=logged_in)
+        stats.timed('GET /workouts', http.get, f'{args.url}/workouts')
+        stats.timed('POST /save_using_automatic', http.post, f'{args.url}/save_using_automatic',
+                    json={'exercise': 'Dumbbell Curl', 'sets': 1, 'reps': 12, 'weight': 5})
+        if not args.skip_stream:
+            watch_stream(args, http, stats)
+        if not args.skip_chat:
+            ask_chatbot(args, http, stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:10000')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=1)
+    parser.add_argument('--frames', type=int, default=50, help='video frames to receive per stream')
+    parser.add_argument('--stream-timeout', type=float, default=30)
+    parser.add_argument('--chat-timeout', type=float, default=60)
+    parser.add_argument('--skip-stream', action='store_true')
+    parser.add_argument('--skip-chat', action='store_true')
+    args = parser.parse_args()
+
+    stats = Stats()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        futures = [pool.submit(simulate_user, args, stats, i) for i in range(args.users)]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print("User failed:", repr(e))
+    elapsed = time.perf_counter() - started
+
+    print(f"\n{args.users} users x {args.iterations} iterations in {elapsed:.1f}s\n")
+    stats.report(elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Login throughput and its effect on a live video stream.
+
+Registers a pool of users, then fires concurrent logins while one Socket.IO
+client watches the exercise stream. Reports logins/sec and login latency,
+plus the gap between video frames before and during the login burst. A large
+jump in frame gaps means hashing is blocking the event loop.
+
+    FRAME_SOURCE=synthetic CHATBOT_BACKEND=fake SESSION_COOKIE_SECURE=0 python app.py
+    python benchmarks/login_benchmark.py --url http://localhost:10000 --users 50 --concurrency 16
+"""
+import argparse
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import socketio
+
+from loadtest import Stats, ack_frame, logged_in, percentile, registered
+
+PASSWORD = 'login-benchmark-password'
+
+
+def register_users(url, count):
+    emails = []
+    for i in range(count):
+        email = f'login-{uuid.uuid4().hex[:12]}@example.com'
+        response = requests.post(f'{url}/register', data={
+            'name': f'Login User {i}', 'email': email, 'password': PASSWORD,
+            'age': 30, 'height': 175, 'weight': 70,
+        }, allow_redirects=False)
+        if not registered(response):
+            raise SystemExit(f"Registering {email} failed ({response.status_code})")
+        emails.append(email)
+    return emails
+
+
+class FrameWatcher:
+    """Records the wall-clock arrival time of every video frame."""
+
+    def __init__(self, url, cookie):
+        self.arrivals = []
+        self.lock = threading.Lock()
+        self.client = socketio.Client(reconnection=False)
+        self.client.on('video-frame', self.on_frame)
+        self.client.connect(url, headers={'Cookie': cookie}, wait_timeout=10)
+        self.client.emit('start-stream', {'exercise': 'Dumbbell Curl'})
+
+    def on_frame(self, data):
+        with self.lock:
+            self.arrivals.append(time.perf_counter())
+        # Without acks flow control paces frames at the ack timeout, which
+        # would hide any stall caused by hashing
+        ack_frame(self.client, data)
+
+    def gaps_between(self, start, end):
+        with self.lock:
+            times = [t for t in self.arrivals if start <= t <= end]
+        return sorted(b - a for a, b in zip(times, times[1:]))
+
+    def close(self):
+        self.client.disconnect()
+
+
+def describe_gaps(label, gaps):
+    if not gaps:
+        print(f"{label:<24} no frames received")
+        return
+    print(f"{label:<24} frames={len(gaps) + 1:<6} p50={percentile(gaps, 50) * 1000:7.1f} ms"
+          f"  p99={percentile(gaps, 99) * 1000:7.1f} ms  max={gaps[-1] * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:10000')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--baseline-seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"Registering {args.users} users...")
+    emails = register_users(args.url, args.users)
+
+    viewer = requests.Session()
+    if not logged_in(viewer.post(f'{args.url}/login', data={'email': emails[0], 'password': PASSWORD},
+                                 allow_redirects=False)):
+        raise SystemExit("The frame viewer could not log in")
+    cookie = '; '.join(f'{c.name}={c.value}' for c in viewer.cookies)
+    watcher = FrameWatcher(args.url, cookie)
+
+    baseline_start = time.perf_counter()
+    time.sleep(args.baseline_seconds)
+    baseline_end = time.perf_counter()
+
+    stats = Stats()
+
+    def login(i):
+        stats.timed('POST /login', requests.post, f'{args.url}/login',
+                    data={'email': emails[i % len(emails)], 'password': PASSWORD}, allow_redirects=False,
+                    check=logged_in)
+
+    burst_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(login, range(args.logins)))
+    burst_end = time.perf_counter()
+    watcher.close()
+
+    elapsed = burst_end - burst_start
+    print(f"\n{args.logins} logins at concurrency {args.concurrency} in {elapsed:.2f}s "
+          f"({args.logins / elapsed:.1f} logins/s)\n")
+    stats.report(elapsed)
+    print()
+    describe_gaps('frame gap (idle)', watcher.gaps_between(baseline_start, baseline_end))
+    describe_gaps('frame gap (logins)', watcher.gaps_between(burst_start, burst_end))
+
+
+if __name__ == '__main__':
+    main()
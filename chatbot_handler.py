@@ -1,13 +1,32 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, session, Response, stream_with_context
 import google.generativeai as genai
 import markdown
 import bleach
 import os
+import json
+import math
+import time
+import uuid
 from dotenv import load_dotenv
 import google.api_core.exceptions as google_exceptions
-from tenacity import retry, stop_after_attempt, wait_fixed
+from tenacity import Retrying, stop_after_attempt, stop_after_delay, wait_exponential, retry_if_exception_type
 import logging
 
+# Chat jobs block on network I/O for seconds. Under eventlet (patched by the
+# gunicorn worker, or just serving ``python app.py``) they must run on real
+# OS threads, and request handlers must wait by yielding to the hub.
+try:
+    import eventlet
+    from eventlet import patcher
+    threading = patcher.original('threading')
+    queue = patcher.original('queue')
+    native_sleep = patcher.original('time').sleep
+    green_sleep = eventlet.sleep
+except ImportError:
+    import threading
+    import queue
+    native_sleep = green_sleep = time.sleep
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,21 +35,379 @@ chatbot_bp = Blueprint('chatbot', __name__, url_prefix='/chatbot')
 
 load_dotenv()
 
-# Get the API key
-GEMINI_API_KEY = os.getenv("API_KEY")
+# "gemini" talks to the real API; "fake" uses a local model for load testing
+CHATBOT_BACKEND = os.getenv("CHATBOT_BACKEND", "gemini")
+
+if CHATBOT_BACKEND == "fake":
+    from fake_llm import FakeGenerativeModel
+    model_factory = FakeGenerativeModel
+else:
+    # Get the API key
+    GEMINI_API_KEY = os.getenv("API_KEY")
 
-if not GEMINI_API_KEY:
-    raise ValueError("API_KEY not found in environment variables")
+    if not GEMINI_API_KEY:
+        raise ValueError("API_KEY not found in environment variables")
 
-genai.configure(api_key=GEMINI_API_KEY)
+    genai.configure(api_key=GEMINI_API_KEY)
+    model_factory = genai.GenerativeModel
 
 # Configure allowed HTML tags and attributes for safe rendering
 ALLOWED_TAGS = ['p', 'br', 'strong', 'em', 'ul', 'ol', 'li', 'code', 'pre']
 ALLOWED_ATTRIBUTES = {'*': ['class']}
 
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(60))
-def generate_content_with_retry(model, prompt):
-    return model.generate_content(prompt)
+# Chat jobs run off the request thread so a slow or failing Gemini call
+# never holds the worker; the client gets a job id straight away and
+# follows the answer over server-sent events.
+CHAT_WORKERS = int(os.getenv("CHAT_WORKERS", "4"))
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "45"))
+CHAT_MAX_ATTEMPTS = int(os.getenv("CHAT_MAX_ATTEMPTS", "3"))
+CHAT_JOB_TTL_SECONDS = 300
+
+# Errors worth another attempt; anything else fails the job immediately
+RETRYABLE_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+chat_jobs = {}
+chat_jobs_lock = threading.Lock()
+
+# Admission control: refuse fast with 429 + Retry-After instead of letting a
+# burst of users drain the quota and pile up retries on every worker.
+CHAT_MODEL_NAME = os.getenv("CHAT_MODEL_NAME", "gemini-2.5-flash")
+CHAT_MAX_INFLIGHT = int(os.getenv("CHAT_MAX_INFLIGHT", str(CHAT_WORKERS)))
+CHAT_MAX_QUEUED = int(os.getenv("CHAT_MAX_QUEUED", "8"))
+CHAT_QUEUE_WAIT_SECONDS = float(os.getenv("CHAT_QUEUE_WAIT_SECONDS", "2"))
+CHAT_USER_RATE_PER_MINUTE = float(os.getenv("CHAT_USER_RATE_PER_MINUTE", "6"))
+CHAT_USER_BURST = int(os.getenv("CHAT_USER_BURST", "3"))
+CHAT_IP_RATE_PER_MINUTE = float(os.getenv("CHAT_IP_RATE_PER_MINUTE", "20"))
+CHAT_IP_BURST = int(os.getenv("CHAT_IP_BURST", "10"))
+CHAT_BUCKET_IDLE_SECONDS = 600
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, capacity):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def take(self):
+        """Consume one token. Returns ``(allowed, retry_after_seconds)``."""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def idle(self, now):
+        return now - self.updated_at > CHAT_BUCKET_IDLE_SECONDS
+
+
+class ChatAdmission:
+    """Per-user and per-IP token buckets plus a global in-flight cap with a
+    short, bounded wait queue.
+
+    Slots are released from chat worker threads, so they are a counter under
+    a native lock; waiters poll with a hub-friendly sleep rather than block
+    on a semaphore.
+    """
+
+    def __init__(self, max_inflight, max_queued, queue_wait):
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.max_queued = max_queued
+        self.queue_wait = queue_wait
+        self.waiting = 0
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def _bucket(self, key, rate, burst):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def _prune(self):
+        now = time.monotonic()
+        for key in [key for key, bucket in self.buckets.items() if bucket.idle(now)]:
+            del self.buckets[key]
+
+    def check_rate(self, user_id, ip):
+        """Returns ``None`` when admitted, otherwise seconds to wait."""
+        with self.lock:
+            if len(self.buckets) > 1000:
+                self._prune()
+            taken = []
+            candidates = [(('ip', ip), CHAT_IP_RATE_PER_MINUTE, CHAT_IP_BURST)]
+            if user_id is not None:
+                candidates.append((('user', user_id), CHAT_USER_RATE_PER_MINUTE, CHAT_USER_BURST))
+            for key, rate, burst in candidates:
+                bucket = self._bucket(key, rate, burst)
+                allowed, retry_after = bucket.take()
+                if not allowed:
+                    # Don't charge the other buckets for a refused request
+                    for other in taken:
+                        other.refund()
+                    return retry_after
+                taken.append(bucket)
+            return None
+
+    def _try_acquire(self):
+        # Caller holds self.lock
+        if self.inflight < self.max_inflight:
+            self.inflight += 1
+            return True
+        return False
+
+    def acquire_slot(self, interval=0.05):
+        with self.lock:
+            if self._try_acquire():
+                return True
+            if self.waiting >= self.max_queued:
+                return False
+            self.waiting += 1
+        try:
+            deadline = time.monotonic() + self.queue_wait
+            while time.monotonic() < deadline:
+                green_sleep(interval)
+                with self.lock:
+                    if self._try_acquire():
+                        return True
+            return False
+        finally:
+            with self.lock:
+                self.waiting -= 1
+
+    def release_slot(self):
+        with self.lock:
+            if self.inflight <= 0:
+                raise ValueError('release_slot called too many times')
+            self.inflight -= 1
+
+
+chat_admission = ChatAdmission(CHAT_MAX_INFLIGHT, CHAT_MAX_QUEUED, CHAT_QUEUE_WAIT_SECONDS)
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(name=CHAT_MODEL_NAME):
+    """Return a shared GenerativeModel instead of building one per request."""
+    with _models_lock:
+        model = _models.get(name)
+        if model is None:
+            model = _models[name] = model_factory(name)
+        return model
+
+
+def too_many_requests(message, retry_after):
+    response = jsonify({'error': message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def render_markdown(text):
+    """Convert markdown to HTML and sanitize it for the chat widget."""
+    html_response = markdown.markdown(text)
+    return bleach.clean(
+        html_response,
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        strip=True
+    )
+
+
+class ChatJob:
+    def __init__(self, message):
+        self.id = uuid.uuid4().hex
+        self.message = message
+        self.status = 'queued'  # queued -> running -> done | error
+        self.text = ''
+        self.html = ''
+        self.error = None
+        self.status_code = 200
+        self.created_at = time.monotonic()
+        self.deadline = self.created_at + CHAT_DEADLINE_SECONDS
+        self.finished_at = None
+        self.version = 0
+        self.changed = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'error')
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def _bump(self):
+        # Caller holds self.changed
+        self.version += 1
+
+    def start(self):
+        with self.changed:
+            self.status = 'running'
+            self.text = ''
+            self.html = ''
+            self._bump()
+
+    def append(self, chunk):
+        with self.changed:
+            self.text += chunk
+            self.html = render_markdown(self.text)
+            self._bump()
+
+    def finish(self, error=None, status_code=200):
+        with self.changed:
+            if error:
+                self.status = 'error'
+                self.error = error
+                self.status_code = status_code
+            else:
+                self.status = 'done'
+            self.finished_at = time.monotonic()
+            self._bump()
+
+    def wait_for_change(self, seen_version, timeout, interval=0.05):
+        """Wait until the job moves past ``seen_version`` or ``timeout`` expires.
+
+        The job is updated from a native thread, so this polls with a
+        hub-friendly sleep instead of blocking on a condition variable.
+        """
+        deadline = time.monotonic() + timeout
+        while self.version == seen_version and not self.finished and time.monotonic() < deadline:
+            green_sleep(interval)
+        return self.version
+
+    def to_dict(self):
+        with self.changed:
+            data = {
+                'job_id': self.id,
+                'status': self.status,
+                'response': self.text,
+                'html_response': self.html,
+            }
+            if self.error:
+                data['error'] = self.error
+            return data
+
+
+def stream_content_with_retry(model, prompt, job):
+    """Stream a Gemini answer into ``job``, retrying transient errors with
+    exponential backoff until the job's deadline."""
+    retrying = Retrying(
+        stop=stop_after_attempt(CHAT_MAX_ATTEMPTS) | stop_after_delay(CHAT_DEADLINE_SECONDS),
+        wait=wait_exponential(multiplier=1, min=1, max=8),
+        retry=retry_if_exception_type(RETRYABLE_ERRORS),
+        reraise=True,
+        sleep=native_sleep,  # runs on a chat worker thread
+    )
+    for attempt in retrying:
+        with attempt:
+            # A retried attempt restarts the answer from scratch
+            job.start()
+            response = model.generate_content(
+                prompt,
+                stream=True,
+                request_options={'timeout': job.remaining()},
+            )
+            for chunk in response:
+                if job.remaining() <= 0:
+                    raise TimeoutError('Chat response exceeded its deadline')
+                if chunk.text:
+                    job.append(chunk.text)
+
+
+def run_chat_job(job):
+    try:
+        model = get_model()
+
+        # Generate response with simplified prompt
+        prompt = f"""You are a fitness assistant. Respond helpfully in markdown with bullet points for lists, **bold** for key terms, and code blocks for routines. Message: {job.message}"""
+
+        stream_content_with_retry(model, prompt, job)
+
+        if not job.text:
+            logger.error("No response text generated")
+            job.finish('No response generated', 500)
+            return
+
+        logger.info(f"Successfully generated response for message: {job.message}")
+        job.finish()
+
+    except google_exceptions.TooManyRequests as e:
+        logger.error(f"Quota exceeded: {str(e)}")
+        job.finish('Quota limit reached. Please try again later or upgrade your plan.', 429)
+    except google_exceptions.NotFound as e:
+        logger.error(f"Model not found: {str(e)}")
+        job.finish('Model not found. Please check available models.', 404)
+    except (TimeoutError, google_exceptions.DeadlineExceeded) as e:
+        logger.error(f"Chat job timed out: {str(e)}")
+        job.finish('The assistant took too long to respond. Please try again.', 504)
+    except ValueError as e:
+        logger.error(f"Invalid input: {str(e)}")
+        job.finish(str(e), 400)
+    except Exception as e:
+        logger.error(f"Error in chat job: {str(e)}")
+        job.finish('Internal server error', 500)
+    finally:
+        chat_admission.release_slot()
+
+
+class ChatWorkers:
+    """A fixed set of native threads running chat jobs from a queue.
+
+    Threads start on the first submit, so importing the app (e.g. for
+    ``flask db upgrade``) doesn't spawn them.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.jobs = queue.Queue()
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def submit(self, job):
+        with self.lock:
+            if not self.threads:
+                for i in range(self.workers):
+                    thread = threading.Thread(target=self._run, name=f'chatbot-{i}', daemon=True)
+                    thread.start()
+                    self.threads.append(thread)
+        self.jobs.put(job)
+
+    def _run(self):
+        while True:
+            run_chat_job(self.jobs.get())
+
+
+chat_workers = ChatWorkers(CHAT_WORKERS)
+
+
+def prune_chat_jobs():
+    now = time.monotonic()
+    with chat_jobs_lock:
+        expired = [job_id for job_id, job in chat_jobs.items()
+                   if job.finished and now - job.finished_at > CHAT_JOB_TTL_SECONDS]
+        for job_id in expired:
+            del chat_jobs[job_id]
+
+
+def get_chat_job(job_id):
+    with chat_jobs_lock:
+        return chat_jobs.get(job_id)
+
 
 @chatbot_bp.route('/chat', methods=['POST'])
 def chat():
@@ -39,7 +416,7 @@ def chat():
         if not request.is_json:
             logger.error(f"Invalid request: Content-Type is {request.content_type}")
             return jsonify({'error': 'Request must be JSON'}), 400
-            
+
         # Get message from JSON
         data = request.get_json()
         message = data.get('message') if data else None
@@ -47,45 +424,66 @@ def chat():
             logger.error("No message provided in request")
             return jsonify({'error': 'No message provided'}), 400
 
-        # Initialize Gemini model
-        model = genai.GenerativeModel('gemini-2.5-flash')  # Use lighter model
-        
-        # Generate response with simplified prompt
-        prompt = f"""You are a fitness assistant. Respond helpfully in markdown with bullet points for lists, **bold** for key terms, and code blocks for routines. Message: {message}"""
-        
-        response = generate_content_with_retry(model, prompt)
-        
-        if not response.text:
-            logger.error("No response text generated")
-            return jsonify({'error': 'No response generated'}), 500
-
-        # Convert markdown to HTML and sanitize
-        html_response = markdown.markdown(response.text)
-        sanitized_html = bleach.clean(
-            html_response,
-            tags=ALLOWED_TAGS,
-            attributes=ALLOWED_ATTRIBUTES,
-            strip=True
-        )
-        
-        logger.info(f"Successfully generated response for message: {message}")
-        return jsonify({
-            'response': response.text,
-            'html_response': sanitized_html
-        })
+        retry_after = chat_admission.check_rate(session.get('user_id'), request.remote_addr)
+        if retry_after is not None:
+            logger.warning(f"Chat rate limit hit for user={session.get('user_id')} ip={request.remote_addr}")
+            return too_many_requests('You are sending messages too quickly. Please wait a moment.', retry_after)
+
+        if not chat_admission.acquire_slot():
+            logger.warning("Chat concurrency limit reached")
+            return too_many_requests('The assistant is busy right now. Please try again shortly.', CHAT_QUEUE_WAIT_SECONDS)
+
+        prune_chat_jobs()
+        job = ChatJob(message)
+        with chat_jobs_lock:
+            chat_jobs[job.id] = job
+        try:
+            chat_workers.submit(job)
+        except Exception:
+            chat_admission.release_slot()
+            raise
 
-    except google_exceptions.TooManyRequests as e:
-        logger.error(f"Quota exceeded: {str(e)}")
         return jsonify({
-            'error': 'Quota limit reached. Please try again later or upgrade your plan.',
-            'details': 'See https://ai.google.dev/gemini-api/docs/rate-limits for more info.'
-        }), 429
-    except google_exceptions.NotFound as e:
-        logger.error(f"Model not found: {str(e)}")
-        return jsonify({'error': 'Model not found. Please check available models.'}), 404
-    except ValueError as e:
-        logger.error(f"Invalid input: {str(e)}")
-        return jsonify({'error': str(e)}), 400
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'{chatbot_bp.url_prefix}/chat/{job.id}',
+            'stream_url': f'{chatbot_bp.url_prefix}/chat/{job.id}/stream'
+        }), 202
+
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@chatbot_bp.route('/chat/<job_id>', methods=['GET'])
+def chat_status(job_id):
+    job = get_chat_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown chat job'}), 404
+    return jsonify(job.to_dict()), job.status_code if job.finished else 200
+
+
+@chatbot_bp.route('/chat/<job_id>/stream', methods=['GET'])
+def chat_stream(job_id):
+    job = get_chat_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown chat job'}), 404
+
+    def events():
+        seen_version = -1
+        while True:
+            version = job.wait_for_change(seen_version, timeout=15)
+            if version == seen_version and not job.finished:
+                # Keep idle proxies from closing the connection
+                yield ': keep-alive\n\n'
+                continue
+            seen_version = version
+            yield f'data: {json.dumps(job.to_dict())}\n\n'
+            if job.finished:
+                break
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,80 @@
+# database.py
+"""Database configuration.
+
+``DATABASE_URL`` selects the database (default ``sqlite:///users.sqlite3``).
+
+SQLite connections are tuned for concurrent readers and writers: WAL
+journaling lets reads proceed during a write, ``busy_timeout`` makes a
+writer wait for the lock instead of failing with "database is locked",
+and ``synchronous=NORMAL`` / ``mmap_size`` cut per-commit fsyncs and read
+syscalls. The pragmas are applied to every pooled connection as it opens.
+
+PostgreSQL (``postgresql://...``, needs ``psycopg2-binary``) gets a sized
+connection pool with pre-ping so connections dropped by the server are
+replaced transparently.
+"""
+import os
+import sqlite3
+from sqlalchemy import event
+
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///users.sqlite3')
+
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+
+
+def normalize_url(url):
+    # Hosting providers still hand out the deprecated postgres:// scheme
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(url):
+    if url.startswith('sqlite'):
+        options = {
+            'connect_args': {
+                'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+                'check_same_thread': False,
+            },
+        }
+        # In-memory databases use a single static connection, not a pool
+        if url not in ('sqlite://', 'sqlite:///:memory:'):
+            options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+        return options
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE}')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+    cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+    cursor.close()
+
+
+def install_sqlite_pragmas(engine):
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', apply_sqlite_pragmas)
+
+
+def configure_database(app, url=None):
+    url = normalize_url(url or DATABASE_URL)
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
@@ -1,49 +1,232 @@
 # dumbbell_curl_script.py
+import os
 import cv2
 import mediapipe as mp
 import numpy as np
+from frame_buffers import FrameBuffers
 
 mp_drawing = mp.solutions.drawing_utils
 mp_pose = mp.solutions.pose
 
-class PoseDetector:
+# Inference quality tiers, best first. input_width downsizes the frame fed to
+# MediaPipe (landmarks are normalised, so drawing still uses the full frame);
+# keyframe_interval runs inference on every k-th frame and tracks the
+# landmarks with optical flow in between.
+QUALITY_TIERS = {
+    'high': {'model_complexity': 2, 'input_width': 640, 'smooth_landmarks': True, 'keyframe_interval': 1},
+    'medium': {'model_complexity': 1, 'input_width': 640, 'smooth_landmarks': True, 'keyframe_interval': 1},
+    'low': {'model_complexity': 0, 'input_width': 480, 'smooth_landmarks': True, 'keyframe_interval': 3},
+    'minimal': {'model_complexity': 0, 'input_width': 320, 'smooth_landmarks': False, 'keyframe_interval': 5},
+}
+TIER_ORDER = ['high', 'medium', 'low', 'minimal']
+DEFAULT_TIER = 'medium'
+
+# Keyframe tracking. POSE_KEYFRAME_INTERVAL > 0 overrides the tier's
+# interval; a keyframe is also forced when too few visible joints survive
+# the forward-backward flow check.
+POSE_KEYFRAME_INTERVAL = int(os.getenv('POSE_KEYFRAME_INTERVAL', '0'))
+FLOW_WIDTH = int(os.getenv('POSE_FLOW_WIDTH', '320'))
+FLOW_MIN_TRACKED = float(os.getenv('POSE_FLOW_MIN_TRACKED', '0.6'))
+FLOW_MAX_FB_ERROR = 1.0   # pixels at FLOW_WIDTH
+FLOW_SMOOTHING = 0.7      # weight of the new flow step vs the joint's previous step
+FLOW_MIN_VISIBILITY = 0.5
+FLOW_LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                      criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+LEFT_SHOULDER = mp_pose.PoseLandmark.LEFT_SHOULDER.value
+LEFT_ELBOW = mp_pose.PoseLandmark.LEFT_ELBOW.value
+LEFT_WRIST = mp_pose.PoseLandmark.LEFT_WRIST.value
+
+def calculate_angle(a, b, c):
+    a = np.array(a)
+    b = np.array(b)
+    c = np.array(c)
+    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
+    angle = np.abs(radians * 180.0 / np.pi)
+    if angle > 180.0:
+        angle = 360 - angle
+    return angle
+
+def landmarks_to_array(pose_landmarks):
+    """MediaPipe landmarks as a (33, 4) float32 array of x, y, z, visibility."""
+    return np.array([[lm.x, lm.y, lm.z, lm.visibility] for lm in pose_landmarks.landmark], dtype=np.float32)
+
+def draw_landmarks(image, landmarks, min_visibility=FLOW_MIN_VISIBILITY):
+    """Draw a (33, 4) landmark array the way ``mp_drawing`` draws the pose."""
+    height, width = image.shape[:2]
+    points = (landmarks[:, :2] * [width, height]).astype(int).tolist()
+    visible = landmarks[:, 3] > min_visibility
+    for a, b in mp_pose.POSE_CONNECTIONS:
+        if visible[a] and visible[b]:
+            cv2.line(image, tuple(points[a]), tuple(points[b]), (245,66,230), 2)
+    for i in np.flatnonzero(visible):
+        cv2.circle(image, tuple(points[i]), 2, (245,117,66), 2)
+
+class RepCounter:
+    """Curl rep counting on a landmark array; needs no MediaPipe, so it can
+    also be driven from recorded sessions."""
+
     def __init__(self):
-        self.pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
         self.counter = 0
         self.stage = None
+        self.last_angle = None
 
-    def calculate_angle(self, a, b, c):
-        a = np.array(a)
-        b = np.array(b)
-        c = np.array(c)
-        radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-        angle = np.abs(radians * 180.0 / np.pi)
-        if angle > 180.0:
-            angle = 360 - angle
+    def update(self, landmarks):
+        """Advance the rep state with one frame's (33, >=2) landmarks.
+        Returns the elbow angle, or ``None`` if the joints are missing."""
+        shoulder = landmarks[LEFT_SHOULDER, :2]
+        elbow = landmarks[LEFT_ELBOW, :2]
+        wrist = landmarks[LEFT_WRIST, :2]
+        if np.isnan(shoulder).any() or np.isnan(elbow).any() or np.isnan(wrist).any():
+            self.last_angle = None
+            return None
+
+        angle = self.last_angle = calculate_angle(shoulder, elbow, wrist)
+        if angle > 160:
+            self.stage = "down"
+        if angle < 30 and self.stage == "down":
+            self.stage = "up"
+            self.counter += 1
         return angle
+
+class PoseDetector:
+    def __init__(self, tier=DEFAULT_TIER, keyframe_interval=POSE_KEYFRAME_INTERVAL):
+        self.tier = None
+        self.pose = None
+        self.set_tier(tier)
+        self.keyframe_interval = keyframe_interval
+        self.rep_counter = RepCounter()
+        self.frame_index = 0
+        self.last_landmarks = None
+        self.prev_gray = None
+        self.flow_velocity = np.zeros((33, 2), dtype=np.float32)
+        self.buffers = FrameBuffers()
+        self.keyframes = 0
+        self.tracked_frames = 0
+        self.last_was_keyframe = False
+
+    @property
+    def counter(self):
+        return self.rep_counter.counter
+
+    @property
+    def stage(self):
+        return self.rep_counter.stage
+
+    def set_tier(self, tier):
+        """Switch quality tier, rebuilding the MediaPipe graph only if needed."""
+        if tier not in QUALITY_TIERS:
+            raise ValueError(f"Unknown quality tier: {tier}")
+        old = QUALITY_TIERS.get(self.tier)
+        new = QUALITY_TIERS[tier]
+        if (self.pose is None or old['model_complexity'] != new['model_complexity']
+                or old['smooth_landmarks'] != new['smooth_landmarks']):
+            if self.pose is not None:
+                self.pose.close()
+            self.pose = mp_pose.Pose(model_complexity=new['model_complexity'],
+                                     smooth_landmarks=new['smooth_landmarks'],
+                                     min_detection_confidence=0.5, min_tracking_confidence=0.5)
+        self.tier = tier
+
+    def calculate_angle(self, a, b, c):
+        return calculate_angle(a, b, c)
+
     def expose_counter(self):
         return self.counter
 
+    def detect(self, frame):
+        """Run MediaPipe on a BGR frame, downscaled to the tier's input width.
+
+        Scaling happens before the RGB conversion, and both land in reused
+        buffers, so the full-size frame is never copied.
+        """
+        small = self.buffers.resize('infer', frame, QUALITY_TIERS[self.tier]['input_width'])
+        return self.pose.process(self.buffers.convert('rgb', small, cv2.COLOR_BGR2RGB, 3))
+
+    def current_keyframe_interval(self):
+        return self.keyframe_interval or QUALITY_TIERS[self.tier]['keyframe_interval']
+
+    def infer(self, frame):
+        """Full MediaPipe inference on a BGR frame; landmark array or ``None``."""
+        self.keyframes += 1
+        self.last_was_keyframe = True
+        results = self.detect(frame)
+        if not results.pose_landmarks:
+            return None
+        return landmarks_to_array(results.pose_landmarks)
+
+    def flow_image(self, frame):
+        """Downscaled grayscale copy of ``frame`` for optical flow."""
+        small = self.buffers.resize('flow', frame, FLOW_WIDTH)
+        # Alternate between two buffers: the previous frame's image is still needed
+        return self.buffers.convert(f'gray{self.frame_index % 2}', small, cv2.COLOR_BGR2GRAY, 1)
+
+    def track(self, gray):
+        """Move the last landmarks to ``gray`` with pyramidal Lucas-Kanade.
+
+        Returns the tracked array, or ``None`` when too few visible joints
+        could be followed and a keyframe is needed.
+        """
+        visible = np.flatnonzero(self.last_landmarks[:, 3] > FLOW_MIN_VISIBILITY)
+        if len(visible) == 0:
+            return None
+        scale = np.array([gray.shape[1], gray.shape[0]], dtype=np.float32)
+        points = (self.last_landmarks[visible, :2] * scale).astype(np.float32).reshape(-1, 1, 2)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, points, None, **FLOW_LK_PARAMS)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, moved, None, **FLOW_LK_PARAMS)
+        fb_error = np.linalg.norm((points - back).reshape(-1, 2), axis=1)
+        ok = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < FLOW_MAX_FB_ERROR)
+        if ok.mean() < FLOW_MIN_TRACKED:
+            return None
+
+        # Smooth each joint's step rather than its position, so steady
+        # motion is followed without lag while jitter is damped
+        landmarks = self.last_landmarks.copy()
+        tracked = visible[ok]
+        step = (moved - points).reshape(-1, 2)[ok] / scale
+        velocity = self.flow_velocity[tracked] = (FLOW_SMOOTHING * step
+                                                  + (1 - FLOW_SMOOTHING) * self.flow_velocity[tracked])
+        landmarks[tracked, :2] += velocity
+        return landmarks
+
+    def next_landmarks(self, frame):
+        """Landmarks for ``frame``: inferred on keyframes, tracked otherwise."""
+        self.last_was_keyframe = False
+        interval = self.current_keyframe_interval()
+        if interval <= 1:
+            self.prev_gray = None
+            return self.infer(frame)
+
+        gray = self.flow_image(frame)
+        landmarks = None
+        keyframe = (self.last_landmarks is None or self.prev_gray is None
+                    or self.prev_gray.shape != gray.shape or self.frame_index % interval == 0)
+        if not keyframe:
+            landmarks = self.track(gray)
+            if landmarks is not None:
+                self.tracked_frames += 1
+        if landmarks is None:
+            landmarks = self.infer(frame)
+            if landmarks is None:
+                self.flow_velocity[:] = 0
+        self.prev_gray = gray
+        return landmarks
+
     def process_frame(self, frame):
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.pose.process(image)
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-
-        if results.pose_landmarks:
-            landmarks = results.pose_landmarks.landmark
-            shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x, landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-            elbow = [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].x, landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-            wrist = [landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].x, landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y]
-
-            angle = self.calculate_angle(shoulder, elbow, wrist)
-            cv2.putText(image, str(int(angle)), tuple(np.multiply(elbow, [640, 480]).astype(int)), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2, cv2.LINE_AA)
-
-            if angle > 160:
-                self.stage = "down"
-            if angle < 30 and self.stage == "down":
-                self.stage = "up"
-                self.counter += 1
+        """Update the landmarks and rep count, then draw the overlay onto
+        ``frame`` in place and return it."""
+        landmarks = self.last_landmarks = self.next_landmarks(frame)
+        self.frame_index += 1
+        image = frame
+
+        if landmarks is not None:
+            angle = self.rep_counter.update(landmarks)
+            if angle is not None:
+                elbow = landmarks[LEFT_ELBOW, :2]
+                cv2.putText(image, str(int(angle)), tuple(np.multiply(elbow, [640, 480]).astype(int)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2, cv2.LINE_AA)
+        else:
+            self.rep_counter.last_angle = None
 
         cv2.rectangle(image, (0,0), (225,73), (245,117,16), -1)
         cv2.putText(image, 'REPS', (15,12), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,0), 1, cv2.LINE_AA)
@@ -51,7 +234,10 @@ class PoseDetector:
         cv2.putText(image, 'STAGE', (65,12), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,0), 1, cv2.LINE_AA)
         cv2.putText(image, self.stage, (60,60), cv2.FONT_HERSHEY_SIMPLEX, 2, (255,255,255), 2, cv2.LINE_AA)
 
-        mp_drawing.draw_landmarks(image, results.pose_landmarks, mp_pose.POSE_CONNECTIONS,
-                                  mp_drawing.DrawingSpec(color=(245,117,66), thickness=2, circle_radius=2), 
-                                  mp_drawing.DrawingSpec(color=(245,66,230), thickness=2, circle_radius=2))
+        if landmarks is not None:
+            draw_landmarks(image, landmarks)
         return image
+
+    def close(self):
+        self.pose.close()
+        self.buffers.clear()
@@ -0,0 +1,80 @@
+# fake_llm.py
+"""A local stand-in for ``genai.GenerativeModel`` used for load testing.
+
+Enable it with ``CHATBOT_BACKEND=fake``; no API key is needed. Behaviour is
+tuned through environment variables:
+
+    FAKE_LLM_LATENCY       seconds before the first token (default 0.5)
+    FAKE_LLM_JITTER        random extra latency, uniform 0..N seconds (default 0.2)
+    FAKE_LLM_TOKEN_DELAY   seconds between streamed chunks (default 0.02)
+    FAKE_LLM_ERROR_RATE    fraction of calls that fail (default 0)
+    FAKE_LLM_QUOTA_RATE    fraction of calls that fail with a 429 (default 0)
+"""
+import os
+import random
+import time
+import google.api_core.exceptions as google_exceptions
+
+FAKE_REPLY = """Here is a quick routine to get you started:
+
+- **Warm up** for 5 minutes
+- **Dumbbell curls**: 3 sets of 12 reps
+- **Push-ups**: 3 sets of 10 reps
+- **Cool down** and stretch
+
+```
+Mon/Wed/Fri: full body
+Tue/Thu: light cardio
+```
+"""
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeResponse:
+    def __init__(self, chunks, token_delay):
+        self._chunks = chunks
+        self._token_delay = token_delay
+
+    @property
+    def text(self):
+        return ''.join(self._chunks)
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if self._token_delay:
+                time.sleep(self._token_delay)
+            yield FakeChunk(chunk)
+
+
+class FakeGenerativeModel:
+    def __init__(self, model_name='fake', latency=None, jitter=None, token_delay=None,
+                 error_rate=None, quota_rate=None):
+        self.model_name = model_name
+        self.latency = float(os.getenv('FAKE_LLM_LATENCY', '0.5')) if latency is None else latency
+        self.jitter = float(os.getenv('FAKE_LLM_JITTER', '0.2')) if jitter is None else jitter
+        self.token_delay = float(os.getenv('FAKE_LLM_TOKEN_DELAY', '0.02')) if token_delay is None else token_delay
+        self.error_rate = float(os.getenv('FAKE_LLM_ERROR_RATE', '0')) if error_rate is None else error_rate
+        self.quota_rate = float(os.getenv('FAKE_LLM_QUOTA_RATE', '0')) if quota_rate is None else quota_rate
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        delay = self.latency + random.uniform(0, self.jitter)
+        timeout = (request_options or {}).get('timeout')
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise google_exceptions.DeadlineExceeded('Fake model timed out')
+        time.sleep(delay)
+
+        roll = random.random()
+        if roll < self.quota_rate:
+            raise google_exceptions.TooManyRequests('Fake quota exhausted')
+        if roll < self.quota_rate + self.error_rate:
+            raise google_exceptions.ServiceUnavailable('Fake model unavailable')
+
+        # Split on words so streaming looks like real token delivery
+        words = FAKE_REPLY.split(' ')
+        chunks = [word + ' ' for word in words[:-1]] + [words[-1]]
+        return FakeResponse(chunks, self.token_delay if stream else 0)
@@ -0,0 +1,59 @@
+# frame_buffers.py
+"""Reusable per-session image buffers for the capture -> infer -> encode loop.
+
+OpenCV writes into a ``dst=`` array in place when its shape and dtype
+already match, so keeping one destination per pipeline stage means a
+steady-state frame allocates nothing for resizing or colour conversion.
+Buffers are recreated only when the frame size changes.
+"""
+import cv2
+import numpy as np
+
+
+class FrameBuffers:
+    """Named destination arrays owned by one stream session."""
+
+    def __init__(self):
+        self.arrays = {}
+        self.jpeg_params = [cv2.IMWRITE_JPEG_QUALITY, 80]
+
+    def get(self, name, shape, dtype=np.uint8):
+        array = self.arrays.get(name)
+        if array is None or array.shape != shape or array.dtype != dtype:
+            array = self.arrays[name] = np.empty(shape, dtype=dtype)
+        return array
+
+    def resize(self, name, src, width):
+        """``src`` scaled down to ``width`` (aspect kept), or ``src`` itself if narrower."""
+        if src.shape[1] <= width:
+            return src
+        height = int(src.shape[0] * width / src.shape[1])
+        dst = self.get(name, (height, width) + src.shape[2:], src.dtype)
+        cv2.resize(src, (width, height), dst=dst, interpolation=cv2.INTER_AREA)
+        return dst
+
+    def convert(self, name, src, code, channels):
+        """``cv2.cvtColor(src, code)`` into the buffer called ``name``."""
+        shape = src.shape[:2] + ((channels,) if channels > 1 else ())
+        dst = self.get(name, shape, src.dtype)
+        cv2.cvtColor(src, code, dst=dst)
+        return dst
+
+    def encode_jpeg(self, image, quality):
+        """JPEG bytes for ``image``; ``None`` if encoding failed.
+
+        ``imencode`` has no output parameter, so its buffer and the bytes
+        copy Socket.IO needs are the only allocations left per frame. The
+        bytes go out as a binary attachment, not a base64 string.
+        """
+        self.jpeg_params[1] = int(quality)
+        success, buffer = cv2.imencode('.jpg', image, self.jpeg_params)
+        if not success:
+            return None
+        return buffer.tobytes()
+
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def clear(self):
+        self.arrays.clear()
@@ -0,0 +1,256 @@
+# frame_sources.py
+"""Frame sources for the exercise stream.
+
+Everything here mimics the small part of ``cv2.VideoCapture`` the stream loop
+uses (``isOpened``/``read``/``release``) so a webcam, a recorded clip, a
+directory of still images or a synthetic pattern can be swapped in without
+touching the loop. Pick one with the ``FRAME_SOURCE`` environment variable:
+
+    FRAME_SOURCE=0                     webcam index (default, V4L2 on Linux)
+    FRAME_SOURCE=/dev/video2           V4L2 device path
+    FRAME_SOURCE=clips/curl.mp4        replay a video file
+    FRAME_SOURCE=clips/frames/         replay a directory of images
+    FRAME_SOURCE=synthetic:640x480@30  generated test pattern
+
+``ThreadedFrameReader`` wraps any of them with a native capture thread so
+blocking reads never run on the eventlet hub.
+"""
+import os
+import re
+import sys
+import collections
+import cv2
+import numpy as np
+
+try:
+    # Capture must run on a real OS thread even when eventlet has
+    # monkey-patched threading/time, otherwise a blocking read stalls the hub.
+    from eventlet import patcher
+    _threading = patcher.original('threading')
+    time = patcher.original('time')
+except ImportError:
+    import threading as _threading
+    import time
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+class VideoFileSource:
+    """Replays a video file, optionally looping and pacing it to real time."""
+
+    def __init__(self, path, loop=True, realtime=True):
+        self.path = path
+        self.loop = loop
+        self.capture = cv2.VideoCapture(path)
+        fps = self.capture.get(cv2.CAP_PROP_FPS) if self.capture.isOpened() else 0
+        self.frame_interval = 1.0 / fps if realtime and fps and fps > 0 else 0
+        self.next_frame_at = time.monotonic()
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def _pace(self):
+        if self.frame_interval:
+            delay = self.next_frame_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_frame_at = max(self.next_frame_at, time.monotonic()) + self.frame_interval
+
+    def read(self, image=None):
+        self._pace()
+        success, frame = self.capture.read(image)
+        if not success and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.capture.read(image)
+        return success, frame
+
+    def release(self):
+        self.capture.release()
+
+
+class ImageDirectorySource:
+    """Replays the images in a directory in name order."""
+
+    def __init__(self, path, loop=True, fps=10):
+        self.paths = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        # Decode once up front so replay measures the app, not the disk
+        self.frames = [frame for frame in (cv2.imread(p) for p in self.paths) if frame is not None]
+        self.loop = loop
+        self.index = 0
+        self.frame_interval = 1.0 / fps if fps else 0
+        self.next_frame_at = time.monotonic()
+
+    def isOpened(self):
+        return bool(self.frames)
+
+    def read(self, image=None):
+        if self.index >= len(self.frames):
+            if not self.loop or not self.frames:
+                return False, None
+            self.index = 0
+        if self.frame_interval:
+            delay = self.next_frame_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_frame_at = max(self.next_frame_at, time.monotonic()) + self.frame_interval
+        frame = self.frames[self.index]
+        self.index += 1
+        if image is not None and image.shape == frame.shape:
+            image[...] = frame
+            return True, image
+        return True, frame.copy()
+
+    def release(self):
+        self.frames = []
+
+
+class SyntheticSource:
+    """Generates a moving test pattern; handy for benchmarks with no camera or clip."""
+
+    def __init__(self, width=640, height=480, fps=30):
+        self.width = width
+        self.height = height
+        self.frame_interval = 1.0 / fps if fps else 0
+        self.next_frame_at = time.monotonic()
+        self.index = 0
+        self.opened = True
+        # Horizontal gradient, scrolled one step per frame
+        ramp = np.linspace(0, 255, width, dtype=np.uint8)
+        self.pattern = np.dstack([np.tile(ramp, (height, 1))] * 3)
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self, image=None):
+        if not self.opened:
+            return False, None
+        if self.frame_interval:
+            delay = self.next_frame_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_frame_at = max(self.next_frame_at, time.monotonic()) + self.frame_interval
+        if image is None or image.shape != self.pattern.shape:
+            image = np.empty_like(self.pattern)
+        shift = (self.index * 8) % self.width
+        image[:, :self.width - shift] = self.pattern[:, shift:]
+        image[:, self.width - shift:] = self.pattern[:, :shift]
+        self.index += 1
+        return True, image
+
+    def release(self):
+        self.opened = False
+
+
+def open_device(device):
+    """Open a camera by index or /dev/video path, preferring V4L2 on Linux."""
+    if sys.platform.startswith('linux'):
+        capture = cv2.VideoCapture(device, cv2.CAP_V4L2)
+    else:
+        capture = cv2.VideoCapture(device)
+    # Keep the driver queue short so we always see the newest frame
+    capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return capture
+
+
+def open_frame_source(spec=None):
+    """Open the frame source described by ``spec`` (defaults to ``$FRAME_SOURCE``)."""
+    spec = spec if spec is not None else os.getenv('FRAME_SOURCE', '0')
+    spec = str(spec)
+    if spec.isdigit():
+        return open_device(int(spec))
+    if spec.startswith('/dev/video'):
+        return open_device(spec)
+    if spec.startswith('synthetic'):
+        match = re.match(r'synthetic(?::(\d+)x(\d+))?(?:@(\d+))?$', spec)
+        if not match:
+            raise ValueError(f"Invalid synthetic frame source: {spec}")
+        width, height, fps = match.groups()
+        return SyntheticSource(int(width or 640), int(height or 480), int(fps or 30))
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec)
+    return VideoFileSource(spec)
+
+
+class ThreadedFrameReader:
+    """Reads a frame source on a dedicated capture thread.
+
+    The thread fills a small pool of preallocated buffers (``read(image=...)``)
+    and keeps the newest ``slots`` frames; older ones are dropped, so the
+    consumer always processes the most recent frame instead of a backlog.
+    ``read_latest`` never blocks: it returns ``None`` while no new frame is
+    ready. A returned frame belongs to the caller until the next call.
+    """
+
+    def __init__(self, source, slots=2):
+        self.source = source
+        self.slots = max(1, slots)
+        # slots ready frames + one held by the consumer + one being written
+        self.buffers = [None] * (self.slots + 2)
+        self.ready = collections.deque()
+        self.held = None
+        self.lock = _threading.Lock()
+        self.running = False
+        self.ended = False
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.thread = None
+
+    def isOpened(self):
+        return self.source.isOpened()
+
+    def start(self):
+        self.running = True
+        self.thread = _threading.Thread(target=self._capture_loop, name='frame-capture', daemon=True)
+        self.thread.start()
+        return self
+
+    def _free_buffer(self):
+        # Caller holds self.lock
+        for index in range(len(self.buffers)):
+            if index != self.held and index not in self.ready:
+                return index
+        # Every spare buffer holds an unread frame: recycle the oldest
+        self.frames_dropped += 1
+        return self.ready.popleft()
+
+    def _capture_loop(self):
+        try:
+            while self.running:
+                with self.lock:
+                    index = self._free_buffer()
+                success, frame = self.source.read(self.buffers[index])
+                if not success or frame is None:
+                    break
+                with self.lock:
+                    # The source may hand back a new array (first frame, size change)
+                    self.buffers[index] = frame
+                    self.ready.append(index)
+                    while len(self.ready) > self.slots:
+                        self.ready.popleft()
+                        self.frames_dropped += 1
+                    self.frames_captured += 1
+        except Exception as e:
+            print("Frame capture error:", repr(e))
+        finally:
+            self.ended = True
+
+    def read_latest(self):
+        """Return the newest unread frame, or ``None`` if there isn't one yet."""
+        with self.lock:
+            if not self.ready:
+                return None
+            index = self.ready.pop()
+            # Anything older than the newest frame is stale
+            self.frames_dropped += len(self.ready)
+            self.ready.clear()
+            self.held = index
+            return self.buffers[index]
+
+    def release(self):
+        self.running = False
+        if self.thread is not None and self.thread is not _threading.current_thread():
+            self.thread.join(timeout=1.0)
+        self.source.release()
@@ -0,0 +1,260 @@
+# group_tracking.py
+"""Group-class mode: rep counting for several people in one camera frame.
+
+MediaPipe's pose graph follows a single person, so group mode finds people
+first and gives each one a graph of their own:
+
+1. an OpenCV HOG person detector runs on a downscaled frame every
+   ``GROUP_DETECT_INTERVAL`` frames;
+2. an IoU tracker matches the boxes to people seen before, so identities
+   (and rep counts) survive from frame to frame;
+3. each tracked person's crop goes through their own ``mp_pose.Pose`` and
+   ``RepCounter``; between detections a person's box follows their own
+   landmarks.
+
+MediaPipe Pose takes one image per call, so crops are processed one after
+another; the cost grows with the number of people, not the frame size.
+
+    GROUP_MAX_PEOPLE        people tracked at once (default 8)
+    GROUP_DETECT_INTERVAL   frames between person detections (default 5)
+    GROUP_DETECT_WIDTH      width the detector sees (default 480)
+    GROUP_MAX_MISSED        detections a person may be missing before
+                            their track ends (default 3)
+"""
+import os
+import cv2
+import numpy as np
+
+from dumbel_curl_script import (DEFAULT_TIER, LEFT_ELBOW, QUALITY_TIERS, RepCounter, draw_landmarks,
+                                landmarks_to_array, mp_pose)
+from frame_buffers import FrameBuffers
+
+GROUP_MAX_PEOPLE = int(os.getenv('GROUP_MAX_PEOPLE', '8'))
+GROUP_DETECT_INTERVAL = int(os.getenv('GROUP_DETECT_INTERVAL', '5'))
+GROUP_DETECT_WIDTH = int(os.getenv('GROUP_DETECT_WIDTH', '480'))
+GROUP_MAX_MISSED = int(os.getenv('GROUP_MAX_MISSED', '3'))
+GROUP_MIN_IOU = 0.3
+CROP_MARGIN = 0.15
+LANDMARK_MIN_VISIBILITY = 0.5
+
+
+def iou(a, b):
+    """Intersection over union of two ``(x1, y1, x2, y2)`` boxes."""
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    inter = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def expand_box(box, margin, width, height):
+    """``box`` grown by ``margin`` of its size on each side, clamped to the frame."""
+    x1, y1, x2, y2 = box
+    dx, dy = (x2 - x1) * margin, (y2 - y1) * margin
+    return (max(0, int(x1 - dx)), max(0, int(y1 - dy)), min(width, int(x2 + dx)), min(height, int(y2 + dy)))
+
+
+class PersonDetector:
+    """HOG + linear SVM people detector from OpenCV; no extra model files."""
+
+    def __init__(self, detect_width=GROUP_DETECT_WIDTH):
+        self.detect_width = detect_width
+        self.hog = cv2.HOGDescriptor()
+        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+        self.buffers = FrameBuffers()
+
+    def detect(self, frame):
+        """Person boxes ``(x1, y1, x2, y2)`` in frame pixels, most confident first."""
+        small = self.buffers.resize('detect', frame, self.detect_width)
+        scale = frame.shape[1] / small.shape[1]
+        rects, weights = self.hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        if len(rects) == 0:
+            return []
+        weights = np.asarray(weights, dtype=np.float32).ravel()
+        keep = cv2.dnn.NMSBoxes([list(map(int, r)) for r in rects], weights.tolist(), 0.0, 0.45)
+        keep = sorted(np.asarray(keep).ravel(), key=lambda i: -weights[i])
+        return [tuple(float(v) * scale for v in (x, y, x + w, y + h))
+                for x, y, w, h in (rects[i] for i in keep)]
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.missed = 0
+
+
+class IoUTracker:
+    """Greedy IoU matching of detections to existing tracks."""
+
+    def __init__(self, max_people=GROUP_MAX_PEOPLE, max_missed=GROUP_MAX_MISSED, min_iou=GROUP_MIN_IOU):
+        self.max_people = max_people
+        self.max_missed = max_missed
+        self.min_iou = min_iou
+        self.tracks = []
+        self.next_id = 1
+
+    def update(self, boxes):
+        """Match ``boxes`` to tracks; returns ``(started, ended)`` track lists."""
+        pairs = sorted(((iou(track.box, box), t, b) for t, track in enumerate(self.tracks)
+                        for b, box in enumerate(boxes)), reverse=True)
+        matched_tracks, matched_boxes = set(), set()
+        for overlap, t, b in pairs:
+            if overlap < self.min_iou:
+                break
+            if t in matched_tracks or b in matched_boxes:
+                continue
+            self.tracks[t].box = boxes[b]
+            self.tracks[t].missed = 0
+            matched_tracks.add(t)
+            matched_boxes.add(b)
+
+        ended = []
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    ended.append(track)
+        self.tracks = [track for track in self.tracks if track not in ended]
+
+        started = []
+        for b, box in enumerate(boxes):
+            if b in matched_boxes or len(self.tracks) >= self.max_people:
+                continue
+            track = Track(self.next_id, box)
+            self.next_id += 1
+            self.tracks.append(track)
+            started.append(track)
+        return started, ended
+
+
+class PersonPose:
+    """One tracked person's pose graph and rep state."""
+
+    def __init__(self, tier):
+        settings = QUALITY_TIERS[tier]
+        self.pose = mp_pose.Pose(model_complexity=settings['model_complexity'],
+                                 smooth_landmarks=settings['smooth_landmarks'],
+                                 min_detection_confidence=0.5, min_tracking_confidence=0.5)
+        self.rep_counter = RepCounter()
+        self.landmarks = None
+
+    def close(self):
+        self.pose.close()
+
+
+class GroupPoseTracker:
+    """Drop-in for ``PoseDetector`` in the stream loop when several people train."""
+
+    def __init__(self, tier=DEFAULT_TIER, detect_interval=GROUP_DETECT_INTERVAL, max_people=GROUP_MAX_PEOPLE):
+        self.tier = tier
+        self.detect_interval = max(1, detect_interval)
+        self.detector = PersonDetector()
+        self.tracker = IoUTracker(max_people=max_people)
+        self.people = {}
+        self.buffers = FrameBuffers()
+        self.frame_index = 0
+        self.last_was_keyframe = True  # every tracked person is inferred each frame
+
+    def set_tier(self, tier):
+        """Switch quality tier; each person's graph is rebuilt if it changes."""
+        if tier not in QUALITY_TIERS:
+            raise ValueError(f"Unknown quality tier: {tier}")
+        old, new = QUALITY_TIERS[self.tier], QUALITY_TIERS[tier]
+        if (old['model_complexity'] != new['model_complexity']
+                or old['smooth_landmarks'] != new['smooth_landmarks']):
+            for track_id, person in self.people.items():
+                person.pose.close()
+                rebuilt = PersonPose(tier)
+                rebuilt.rep_counter = person.rep_counter
+                self.people[track_id] = rebuilt
+        self.tier = tier
+
+    def landmark_box(self, landmarks, width, height):
+        visible = landmarks[:, 3] > LANDMARK_MIN_VISIBILITY
+        if visible.sum() < 4:
+            return None
+        xs = landmarks[visible, 0] * width
+        ys = landmarks[visible, 1] * height
+        return (float(xs.min()), float(ys.min()), float(xs.max()), float(ys.max()))
+
+    def estimate(self, frame, track):
+        """Run the person's pose graph on their crop; landmarks in frame coordinates."""
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = expand_box(track.box, CROP_MARGIN, width, height)
+        if x2 - x1 < 16 or y2 - y1 < 16:
+            return None
+        crop = self.buffers.convert(f'crop{track.id}', frame[y1:y2, x1:x2], cv2.COLOR_BGR2RGB, 3)
+        results = self.people[track.id].pose.process(crop)
+        if not results.pose_landmarks:
+            return None
+        landmarks = landmarks_to_array(results.pose_landmarks)
+        landmarks[:, 0] = (x1 + landmarks[:, 0] * (x2 - x1)) / width
+        landmarks[:, 1] = (y1 + landmarks[:, 1] * (y2 - y1)) / height
+        return landmarks
+
+    def process_frame(self, frame):
+        """Detect, track and count reps for everyone in ``frame``; draws the
+        overlay onto ``frame`` in place and returns it."""
+        height, width = frame.shape[:2]
+        if self.frame_index % self.detect_interval == 0 or not self.tracker.tracks:
+            started, ended = self.tracker.update(self.detector.detect(frame))
+            for track in ended:
+                self.people.pop(track.id).close()
+                self.buffers.arrays.pop(f'crop{track.id}', None)
+            for track in started:
+                self.people[track.id] = PersonPose(self.tier)
+        self.frame_index += 1
+
+        for track in self.tracker.tracks:
+            person = self.people[track.id]
+            landmarks = person.landmarks = self.estimate(frame, track)
+            if landmarks is None:
+                person.rep_counter.last_angle = None
+                continue
+            person.rep_counter.update(landmarks)
+            # Follow the person between detections
+            box = self.landmark_box(landmarks, width, height)
+            if box is not None:
+                track.box = box
+
+        for track in self.tracker.tracks:
+            self.draw_person(frame, track, self.people[track.id])
+        return frame
+
+    def draw_person(self, image, track, person):
+        x1, y1, x2, y2 = (int(v) for v in track.box)
+        cv2.rectangle(image, (x1, y1), (x2, y2), (245,117,16), 2)
+        label = f"#{track.id} {person.rep_counter.counter} {person.rep_counter.stage or ''}"
+        cv2.putText(image, label, (x1, max(12, y1 - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255,255,255), 2, cv2.LINE_AA)
+        if person.landmarks is not None:
+            draw_landmarks(image, person.landmarks)
+            if person.rep_counter.last_angle is not None:
+                elbow = person.landmarks[LEFT_ELBOW, :2] * [image.shape[1], image.shape[0]]
+                cv2.putText(image, str(int(person.rep_counter.last_angle)), tuple(elbow.astype(int).tolist()),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2, cv2.LINE_AA)
+
+    def state(self):
+        """One entry per tracked person, for the combined per-frame message."""
+        people = []
+        for track in self.tracker.tracks:
+            person = self.people[track.id]
+            angle = person.rep_counter.last_angle
+            people.append({
+                'id': track.id,
+                'box': [int(v) for v in track.box],
+                'reps': person.rep_counter.counter,
+                'stage': person.rep_counter.stage,
+                'angle': None if angle is None else round(float(angle), 1),
+                'visible': person.landmarks is not None,
+            })
+        return people
+
+    def close(self):
+        for person in self.people.values():
+            person.close()
+        self.people.clear()
+        self.tracker.tracks = []
+        self.buffers.clear()
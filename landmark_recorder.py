@@ -0,0 +1,127 @@
+# landmark_recorder.py
+"""Compact binary recordings of pose landmark sessions.
+
+One file per stream session: a 32-byte header followed by fixed-size
+records, one per processed frame. Each record holds the time since the
+session started and the (33, 4) landmark array (x, y, z, visibility).
+Frames with nobody in view are stored as NaN. Because every record is the
+same size, a file can be opened with ``numpy.memmap`` and replayed
+without copying, e.g. to re-score sessions after the rep rules change:
+
+    python landmark_recorder.py info recordings/*.lmk
+    python landmark_recorder.py rescore recordings/*.lmk
+
+Recording is opt-in: set ``RECORD_LANDMARKS_DIR`` to a directory.
+"""
+import os
+import struct
+import sys
+import time
+import uuid
+import numpy as np
+
+MAGIC = b'FTLM'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHBxd12x')  # magic, version, landmarks, channels, dtype code, start time
+DTYPE_CODES = {0: np.dtype('<f2'), 1: np.dtype('<f4')}
+N_LANDMARKS = 33
+N_CHANNELS = 4
+
+RECORD_LANDMARKS_DIR = os.getenv('RECORD_LANDMARKS_DIR')
+RECORD_LANDMARKS_DTYPE = os.getenv('RECORD_LANDMARKS_DTYPE', 'float16')
+
+
+def record_dtype(landmark_dtype, n_landmarks=N_LANDMARKS, n_channels=N_CHANNELS):
+    return np.dtype([('t', '<f4'), ('landmarks', landmark_dtype, (n_landmarks, n_channels))])
+
+
+class LandmarkRecorder:
+    def __init__(self, path, dtype=RECORD_LANDMARKS_DTYPE, n_landmarks=N_LANDMARKS, n_channels=N_CHANNELS):
+        landmark_dtype = np.dtype(dtype).newbyteorder('<')
+        codes = {value: code for code, value in DTYPE_CODES.items()}
+        if landmark_dtype not in codes:
+            raise ValueError(f"Unsupported landmark dtype: {dtype}")
+        self.path = path
+        self.started_at = time.time()
+        self.started = time.monotonic()
+        self.record = np.zeros(1, dtype=record_dtype(landmark_dtype, n_landmarks, n_channels))
+        self.frames = 0
+        self.file = open(path, 'xb')  # never truncate another stream's recording
+        self.file.write(HEADER.pack(MAGIC, VERSION, n_landmarks, n_channels, codes[landmark_dtype], self.started_at))
+
+    def write(self, landmarks, t=None):
+        """Append one frame. ``landmarks`` is an (n, 4) array or ``None``."""
+        record = self.record[0]
+        record['t'] = time.monotonic() - self.started if t is None else t
+        if landmarks is None:
+            record['landmarks'] = np.nan
+        else:
+            record['landmarks'] = landmarks
+        self.file.write(self.record.tobytes())
+        self.frames += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def recording_path(directory, session_id):
+    # The random suffix keeps two streams started in the same second (a
+    # reconnect, a second tab) from writing to the same file
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    return os.path.join(directory, f'{stamp}-{session_id}-{uuid.uuid4().hex[:8]}.lmk')
+
+
+def open_recording(path):
+    """Return ``(header, records)``; ``records`` is a read-only memmap."""
+    with open(path, 'rb') as f:
+        magic, version, n_landmarks, n_channels, dtype_code, started_at = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a landmark recording")
+    if version != VERSION:
+        raise ValueError(f"{path}: unsupported recording version {version}")
+    dtype = record_dtype(DTYPE_CODES[dtype_code], n_landmarks, n_channels)
+    header = {'version': version, 'landmarks': n_landmarks, 'channels': n_channels,
+              'dtype': DTYPE_CODES[dtype_code].name, 'started_at': started_at}
+    # A session killed mid-write may leave a partial last record: ignore it
+    frames = (os.path.getsize(path) - HEADER.size) // dtype.itemsize
+    if frames == 0:
+        return header, np.zeros(0, dtype=dtype)
+    return header, np.memmap(path, dtype=dtype, mode='r', offset=HEADER.size, shape=(frames,))
+
+
+def replay(path, counter=None):
+    """Run a recording through a rep counter; returns the counter."""
+    if counter is None:
+        from dumbel_curl_script import RepCounter
+        counter = RepCounter()
+    _, records = open_recording(path)
+    landmarks = records['landmarks']
+    for i in range(len(records)):
+        frame = landmarks[i]
+        if not np.isnan(frame[0, 0]):
+            counter.update(frame)
+    return counter
+
+
+def main(argv):
+    if len(argv) < 2 or argv[0] not in ('info', 'rescore'):
+        print(__doc__)
+        return 1
+    command, paths = argv[0], argv[1:]
+    for path in paths:
+        header, records = open_recording(path)
+        if command == 'info':
+            duration = float(records['t'][-1]) if len(records) else 0.0
+            print(f"{path}: {len(records)} frames, {duration:.1f}s, {header['dtype']}, "
+                  f"started {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(header['started_at']))}")
+        else:
+            started = time.perf_counter()
+            counter = replay(path)
+            elapsed = time.perf_counter() - started
+            print(f"{path}: {counter.counter} reps ({len(records)} frames in {elapsed * 1000:.1f} ms)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
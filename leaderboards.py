@@ -0,0 +1,148 @@
+# leaderboards.py
+"""Gym-wide leaderboards.
+
+Totals live in the ``leaderboard_entry`` summary table, one row per
+(exercise, metric, period, period start, user), and are bumped in the same
+transaction as each workout insert. Reads never aggregate the workout
+table: the top of each board is cached in memory and kept current as
+workouts are saved. A user's own rank comes from a sorted copy of the
+board's totals, also kept in memory once someone asks for it.
+"""
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, timedelta
+
+LEADERBOARD_METRICS = ('reps', 'volume', 'sessions')
+LEADERBOARD_PERIODS = ('day', 'week', 'all')
+LEADERBOARD_TOP_K = 25
+ALL_TIME_START = date(1970, 1, 1)
+
+
+def period_start(period, when):
+    """First day of the ``period`` containing ``when``."""
+    day = when.date() if hasattr(when, 'date') else when
+    if period == 'day':
+        return day
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'all':
+        return ALL_TIME_START
+    raise ValueError(f"Unknown leaderboard period: {period}")
+
+
+def workout_metrics(sets, reps, weight):
+    """Leaderboard increments contributed by one workout."""
+    sets = int(sets or 0)
+    reps = int(reps or 0)
+    weight = float(weight) if weight not in (None, '') else 0.0
+    return {
+        'reps': sets * reps,
+        'volume': sets * reps * weight,
+        'sessions': 1,
+    }
+
+
+class TopK:
+    """The best ``k`` (user_id, value) pairs of one board, highest first."""
+
+    def __init__(self, k, entries=()):
+        self.k = k
+        self.entries = sorted(entries, key=lambda e: (-e[1], e[0]))[:k]
+
+    def offer(self, user_id, value):
+        # Totals only grow, so a user already listed just moves up
+        entries = [e for e in self.entries if e[0] != user_id]
+        if len(entries) < self.k or value > entries[-1][1]:
+            entries.append((user_id, value))
+            entries.sort(key=lambda e: (-e[1], e[0]))
+        self.entries = entries[:self.k]
+
+
+class BoardRanks:
+    """Every user's total on one board, with the values kept sorted.
+
+    A rank is a bisection, O(log n) whatever the board size; an update
+    removes the old value and inserts the new one (the list shift is a
+    memmove, not a Python loop).
+    """
+
+    def __init__(self, entries=()):
+        self.by_user = dict(entries)
+        self.values = sorted(self.by_user.values())
+
+    def rank(self, user_id):
+        """``(rank, value)`` for ``user_id``, or ``None`` without a total."""
+        value = self.by_user.get(user_id)
+        if value is None:
+            return None
+        return len(self.values) - bisect_right(self.values, value) + 1, value
+
+    def offer(self, user_id, value):
+        old = self.by_user.get(user_id)
+        if old is not None:
+            del self.values[bisect_left(self.values, old)]
+        self.by_user[user_id] = value
+        insort(self.values, value)
+
+
+class LeaderboardCache:
+    """In-memory top-K and ranks per board, loaded from the summary table
+    on first use.
+
+    ``loader(board, k)`` returns the top ``k`` (user_id, value) pairs for a
+    board key ``(exercise, metric, period, period_start)``, or every pair
+    when ``k`` is ``None``.
+    """
+
+    def __init__(self, loader, k=LEADERBOARD_TOP_K):
+        self.loader = loader
+        self.k = k
+        self.boards = {}
+        self.ranks = {}
+        self.lock = threading.Lock()
+
+    def top(self, board):
+        with self.lock:
+            top = self.boards.get(board)
+        if top is None:
+            top = TopK(self.k, self.loader(board, self.k))
+            with self.lock:
+                top = self.boards.setdefault(board, top)
+                self._evict_stale(board)
+        return list(top.entries)
+
+    def rank(self, board, user_id):
+        """``(rank, value)`` of ``user_id`` on ``board``, or ``None``."""
+        with self.lock:
+            ranks = self.ranks.get(board)
+        if ranks is None:
+            # One full read of the board per process; later saves keep it current
+            ranks = BoardRanks(self.loader(board, None))
+            with self.lock:
+                ranks = self.ranks.setdefault(board, ranks)
+                self._evict_stale(board)
+        with self.lock:
+            return ranks.rank(user_id)
+
+    def offer(self, board, user_id, value):
+        with self.lock:
+            top = self.boards.get(board)
+            if top is not None:
+                top.offer(user_id, value)
+            ranks = self.ranks.get(board)
+            if ranks is not None:
+                ranks.offer(user_id, value)
+
+    def clear(self):
+        with self.lock:
+            self.boards.clear()
+            self.ranks.clear()
+
+    def _evict_stale(self, current):
+        # Caller holds self.lock. Drop day/week boards from earlier periods.
+        exercise, metric, period, start = current
+        for cached in (self.boards, self.ranks):
+            stale = [b for b in cached
+                     if b[0] == exercise and b[1] == metric and b[2] == period and b[3] < start]
+            for board in stale:
+                del cached[board]
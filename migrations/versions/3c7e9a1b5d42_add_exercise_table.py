@@ -0,0 +1,34 @@
+"""Add Exercise model
+
+Revision ID: 3c7e9a1b5d42
+Revises: cc5d5782e8f1
+Create Date: 2026-10-19 16:02:18.441907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c7e9a1b5d42'
+down_revision = 'cc5d5782e8f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('exercise'):
+        # Created by db.create_all() when the app still built tables on import
+        return
+    op.create_table('exercise',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('instructions', sa.Text(), nullable=False),
+    sa.Column('tracking_points', sa.String(length=200), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('exercise')
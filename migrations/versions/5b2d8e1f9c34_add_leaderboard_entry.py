@@ -0,0 +1,77 @@
+"""Add leaderboard summary table
+
+Revision ID: 5b2d8e1f9c34
+Revises: 3c7e9a1b5d42
+Create Date: 2026-10-19 10:12:41.318204
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+from leaderboards import LEADERBOARD_PERIODS, period_start, workout_metrics
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2d8e1f9c34'
+down_revision = '3c7e9a1b5d42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if sa.inspect(bind).has_table('leaderboard_entry'):
+        # Created by db.create_all() on an app started before this migration ran
+        leaderboard_entry = sa.table('leaderboard_entry',
+                                     sa.column('exercise', sa.String()), sa.column('metric', sa.String()),
+                                     sa.column('period', sa.String()), sa.column('period_start', sa.Date()),
+                                     sa.column('user_id', sa.Integer()), sa.column('value', sa.Float()))
+        if bind.execute(sa.text('SELECT 1 FROM leaderboard_entry LIMIT 1')).first() is not None:
+            return
+    else:
+        leaderboard_entry = create_leaderboard_entry()
+    backfill(bind, leaderboard_entry)
+
+
+def create_leaderboard_entry():
+    leaderboard_entry = op.create_table('leaderboard_entry',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('exercise', sa.String(length=100), nullable=False),
+    sa.Column('metric', sa.String(length=20), nullable=False),
+    sa.Column('period', sa.String(length=10), nullable=False),
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('exercise', 'metric', 'period', 'period_start', 'user_id', name='uq_leaderboard_entry')
+    )
+    op.create_index('ix_leaderboard_rank', 'leaderboard_entry',
+                    ['exercise', 'metric', 'period', 'period_start', 'value'], unique=False)
+    return leaderboard_entry
+
+
+def backfill(bind, leaderboard_entry):
+    """Fill the totals from existing workouts."""
+    totals = {}
+    for user_id, exercise, sets, reps, weight, date in bind.execute(
+            sa.text('SELECT user_id, exercise, sets, reps, weight, date FROM workout')):
+        if isinstance(date, str):
+            date = datetime.fromisoformat(date)
+        when = date or datetime.now()
+        for metric, delta in workout_metrics(sets, reps, weight).items():
+            for period in LEADERBOARD_PERIODS:
+                key = (exercise, metric, period, period_start(period, when), user_id)
+                totals[key] = totals.get(key, 0) + delta
+    if totals:
+        op.bulk_insert(leaderboard_entry, [
+            {'exercise': exercise, 'metric': metric, 'period': period, 'period_start': start,
+             'user_id': user_id, 'value': value}
+            for (exercise, metric, period, start, user_id), value in totals.items()
+        ])
+
+
+def downgrade():
+    op.drop_index('ix_leaderboard_rank', table_name='leaderboard_entry')
+    op.drop_table('leaderboard_entry')
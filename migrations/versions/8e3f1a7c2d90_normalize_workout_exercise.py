@@ -0,0 +1,79 @@
+"""Normalize workout exercise names into the exercise table
+
+Revision ID: 8e3f1a7c2d90
+Revises: 5b2d8e1f9c34
+Create Date: 2026-10-19 14:37:05.904117
+
+"""
+from collections import Counter, defaultdict
+from alembic import op
+import sqlalchemy as sa
+
+from search_index import exercise_key
+
+
+# revision identifiers, used by Alembic.
+revision = '8e3f1a7c2d90'
+down_revision = '5b2d8e1f9c34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('name_key', sa.String(length=100), nullable=True))
+    with op.batch_alter_table('workout', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('exercise_id', sa.Integer(), nullable=True))
+
+    bind = op.get_bind()
+
+    # Existing exercises own their key; duplicates by key keep the lowest id
+    canonical = {}
+    for exercise_id, name in bind.execute(sa.text('SELECT id, name FROM exercise ORDER BY id')):
+        key = exercise_key(name)
+        if key in canonical:
+            continue
+        canonical[key] = (exercise_id, name)
+        bind.execute(sa.text('UPDATE exercise SET name_key = :key WHERE id = :id'), {'key': key, 'id': exercise_id})
+    bind.execute(sa.text('DELETE FROM exercise WHERE name_key IS NULL'))
+
+    # Group free-text workout names by key; unknown ones become new exercises
+    # named after their most common spelling
+    spellings = defaultdict(Counter)
+    for name, count in bind.execute(sa.text('SELECT exercise, COUNT(*) FROM workout GROUP BY exercise')):
+        spellings[exercise_key(name)][name] += count
+    for key, names in spellings.items():
+        if not key:
+            continue
+        if key not in canonical:
+            name = ' '.join(names.most_common(1)[0][0].split())
+            bind.execute(sa.text(
+                "INSERT INTO exercise (name, name_key, description, instructions, tracking_points) "
+                "VALUES (:name, :key, '', '', '[]')"), {'name': name, 'key': key})
+            exercise_id = bind.execute(sa.text('SELECT id FROM exercise WHERE name_key = :key'), {'key': key}).scalar()
+            canonical[key] = (exercise_id, name)
+        exercise_id, name = canonical[key]
+        for spelling in names:
+            bind.execute(sa.text('UPDATE workout SET exercise_id = :id, exercise = :name WHERE exercise = :spelling'),
+                         {'id': exercise_id, 'name': name, 'spelling': spelling})
+
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.alter_column('name_key', existing_type=sa.String(length=100), nullable=False)
+        batch_op.create_unique_constraint('uq_exercise_name_key', ['name_key'])
+    with op.batch_alter_table('workout', schema=None) as batch_op:
+        batch_op.create_foreign_key('fk_workout_exercise_id', 'exercise', ['exercise_id'], ['id'])
+        batch_op.create_index('ix_workout_user_exercise', ['user_id', 'exercise_id'], unique=False)
+
+    # Leaderboard totals were keyed by the old spellings; the app rebuilds
+    # them from the workout table in ``flask init-db`` when the table is empty
+    bind.execute(sa.text('DELETE FROM leaderboard_entry'))
+
+
+def downgrade():
+    with op.batch_alter_table('workout', schema=None) as batch_op:
+        batch_op.drop_index('ix_workout_user_exercise')
+        batch_op.drop_constraint('fk_workout_exercise_id', type_='foreignkey')
+        batch_op.drop_column('exercise_id')
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_exercise_name_key', type_='unique')
+        batch_op.drop_column('name_key')
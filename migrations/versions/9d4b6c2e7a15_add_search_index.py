@@ -0,0 +1,26 @@
+"""Add FTS5 search index for exercises and workouts
+
+Revision ID: 9d4b6c2e7a15
+Revises: 8e3f1a7c2d90
+Create Date: 2026-10-19 18:21:47.106233
+
+"""
+from alembic import op
+
+from search_index import drop_search_index, install_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4b6c2e7a15'
+down_revision = '8e3f1a7c2d90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite only; other databases search with LIKE
+    install_search_index(op.get_bind())
+
+
+def downgrade():
+    drop_search_index(op.get_bind())
@@ -0,0 +1,30 @@
+"""Mark catalogue exercises as curated
+
+Revision ID: b1f7e3a9c6d8
+Revises: 9d4b6c2e7a15
+Create Date: 2026-10-19 19:05:33.870412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1f7e3a9c6d8'
+down_revision = '9d4b6c2e7a15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('curated', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    # 8e3f1a7c2d90 turned workout names into exercises with no description;
+    # everything else came from the catalogue
+    op.execute("UPDATE exercise SET curated = (description <> '')")
+
+
+def downgrade():
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.drop_column('curated')
@@ -0,0 +1,106 @@
+# pose_quality.py
+"""Load-adaptive quality control for pose inference.
+
+Each stream session reports how long its keyframes take; the controller moves
+the session one tier down (see ``QUALITY_TIERS``) when frames run over
+budget or the machine is short of CPU, and back up once there is headroom
+again. Decisions are rate-limited per session so tiers don't flap.
+"""
+import os
+import time
+from dumbel_curl_script import TIER_ORDER, DEFAULT_TIER
+
+POSE_ADAPTIVE_QUALITY = os.getenv('POSE_ADAPTIVE_QUALITY', '1') != '0'
+POSE_FRAME_BUDGET_MS = float(os.getenv('POSE_FRAME_BUDGET_MS', '80'))
+POSE_MIN_CPU_HEADROOM = float(os.getenv('POSE_MIN_CPU_HEADROOM', '0.15'))
+POSE_TIER_INTERVAL_SECONDS = float(os.getenv('POSE_TIER_INTERVAL_SECONDS', '3'))
+
+
+class CpuMonitor:
+    """Estimates spare CPU from the load average and this process's own usage."""
+
+    def __init__(self):
+        self.cpus = os.cpu_count() or 1
+        self.last_wall = time.monotonic()
+        self.last_cpu = time.process_time()
+        self.headroom = 1.0
+
+    def sample(self):
+        now = time.monotonic()
+        cpu = time.process_time()
+        elapsed = now - self.last_wall
+        if elapsed < 0.5:
+            return self.headroom
+        # The worker is effectively one core (GIL), so measure against one core
+        process_busy = (cpu - self.last_cpu) / elapsed
+        try:
+            system_busy = os.getloadavg()[0] / self.cpus
+        except (AttributeError, OSError):
+            system_busy = 0.0
+        self.last_wall = now
+        self.last_cpu = cpu
+        self.headroom = max(0.0, 1.0 - max(process_busy, system_busy))
+        return self.headroom
+
+
+class SessionLoad:
+    def __init__(self, tier):
+        self.tier = tier
+        self.frame_ms = None
+        self.changed_at = time.monotonic()
+
+    def record(self, frame_ms, alpha=0.2):
+        if self.frame_ms is None:
+            self.frame_ms = frame_ms
+        else:
+            self.frame_ms += alpha * (frame_ms - self.frame_ms)
+
+
+class QualityController:
+    def __init__(self, frame_budget_ms=POSE_FRAME_BUDGET_MS, min_headroom=POSE_MIN_CPU_HEADROOM,
+                 interval=POSE_TIER_INTERVAL_SECONDS, enabled=POSE_ADAPTIVE_QUALITY):
+        self.frame_budget_ms = frame_budget_ms
+        self.min_headroom = min_headroom
+        self.interval = interval
+        self.enabled = enabled
+        self.cpu = CpuMonitor()
+        self.sessions = {}
+
+    def register(self, session_id, tier=DEFAULT_TIER):
+        self.sessions[session_id] = SessionLoad(tier)
+        return tier
+
+    def unregister(self, session_id):
+        self.sessions.pop(session_id, None)
+
+    def record(self, session_id, frame_ms, keyframe=True):
+        """Record one frame's processing time; returns a new tier or ``None``.
+
+        Only keyframes (frames that ran full inference) count: frames
+        tracked with optical flow cost a fraction of that and would make
+        inference look cheaper than it is.
+        """
+        load = self.sessions.get(session_id)
+        if load is None or not keyframe:
+            return None
+        load.record(frame_ms)
+        if not self.enabled:
+            return None
+
+        now = time.monotonic()
+        if now - load.changed_at < self.interval:
+            return None
+
+        headroom = self.cpu.sample()
+        position = TIER_ORDER.index(load.tier)
+        if load.frame_ms > self.frame_budget_ms or headroom < self.min_headroom:
+            position = min(position + 1, len(TIER_ORDER) - 1)
+        elif load.frame_ms < self.frame_budget_ms * 0.5 and headroom > self.min_headroom * 2:
+            position = max(position - 1, 0)
+
+        new_tier = TIER_ORDER[position]
+        if new_tier == load.tier:
+            return None
+        load.tier = new_tier
+        load.changed_at = now
+        return new_tier
@@ -0,0 +1,102 @@
+# rep_segmenter.py
+"""Streaming rep and set segmentation on top of ``PoseDetector``.
+
+Fed one observation per processed frame (time, elbow angle, cumulative rep
+counter), the segmenter turns the stream into discrete events: a ``rep``
+event per completed rep with its duration and angle range, and a
+``set-complete`` event once no rep has followed for ``idle_gap`` seconds
+(or the stream ends). Set boundaries are decided on the server, so they no
+longer depend on client-side timers or storage.
+"""
+import os
+
+REP_IDLE_GAP_SECONDS = float(os.getenv('REP_IDLE_GAP_SECONDS', '120'))
+# RepCounter's "down" threshold: the arm is extended again, the next rep begins
+REP_EXTENDED_ANGLE = 160
+
+
+class RepSegmenter:
+    def __init__(self, idle_gap=REP_IDLE_GAP_SECONDS):
+        self.idle_gap = idle_gap
+        self.baseline = None
+        self.last_counter = None
+        self.set_number = 0
+        self.set_reps = 0
+        self.set_started_at = None
+        self.last_rep_at = None
+        self.rep_started_at = None
+        self.min_angle = None
+        self.max_angle = None
+        self.max_angle_at = None
+        self.at_bottom = False
+        self.completed_sets = []
+
+    def _track_angle(self, t, angle):
+        if angle is None:
+            return
+        if self.at_bottom and angle > REP_EXTENDED_ANGLE:
+            # The counted rep's bottom is over; its depth isn't the next rep's
+            self.at_bottom = False
+            self.min_angle = None
+        self.min_angle = angle if self.min_angle is None else min(self.min_angle, angle)
+        if self.max_angle is None or angle >= self.max_angle:
+            # A rep starts from the last moment of full extension
+            self.max_angle = angle
+            self.max_angle_at = t
+
+    def _close_set(self, t):
+        completed = {
+            'type': 'set-complete',
+            'set': self.set_number,
+            'reps': self.set_reps,
+            'started_at': self.set_started_at,
+            'ended_at': self.last_rep_at,
+        }
+        self.completed_sets.append(completed)
+        self.set_reps = 0
+        self.set_started_at = None
+        return completed
+
+    def update(self, t, angle, counter):
+        """Feed one frame; returns the list of events it produced."""
+        events = []
+        if self.last_counter is None:
+            # The detector's counter is cumulative; only count reps from here on
+            self.last_counter = counter
+            self.rep_started_at = t
+        self._track_angle(t, angle)
+
+        if self.set_reps and t - self.last_rep_at > self.idle_gap:
+            events.append(self._close_set(t))
+
+        if counter > self.last_counter:
+            rep_started_at = self.max_angle_at if self.max_angle_at is not None else self.rep_started_at
+            for _ in range(counter - self.last_counter):
+                if not self.set_reps:
+                    self.set_number += 1
+                    self.set_started_at = rep_started_at
+                self.set_reps += 1
+                events.append({
+                    'type': 'rep',
+                    'set': self.set_number,
+                    'rep': self.set_reps,
+                    'timestamp': t,
+                    'duration': round(t - rep_started_at, 3),
+                    'min_angle': None if self.min_angle is None else round(float(self.min_angle), 1),
+                    'max_angle': None if self.max_angle is None else round(float(self.max_angle), 1),
+                })
+            self.last_counter = counter
+            self.last_rep_at = t
+            self.rep_started_at = t
+            # The counter fires on the first frame past the bottom threshold;
+            # keep tracking this rep's minimum until the arm extends again
+            self.at_bottom = True
+            self.max_angle = angle
+            self.max_angle_at = None if angle is None else t
+        return events
+
+    def finish(self, t):
+        """Close the set in progress, if any, at the end of the stream."""
+        if self.set_reps:
+            return [self._close_set(t)]
+        return []
@@ -0,0 +1,283 @@
+# report_jobs.py
+"""Background PDF rendering for the workout and diet reports.
+
+ReportLab is pure Python and holds the worker for the whole render, so
+requests only enqueue a job and return its id; a small process pool does
+the rendering. Identical jobs already in flight (same user, same data) are
+shared instead of rendered twice, and the number of queued jobs is capped.
+
+The render functions take plain data (no models, no app context) because
+they run in a spawned child process. Spawned children start a fresh
+interpreter (no inherited eventlet hub, sockets or MediaPipe graphs), but
+they do import the entry-point script again as ``__mp_main__``: under
+``python app.py`` each child loads app.py's imports and module-level setup,
+though not its ``__main__`` block; under gunicorn they load nothing of the
+app beyond this module.
+
+``on_finished`` is called from the pool's manager thread, which may be a
+native thread; it should hand the job to the event loop rather than write
+to sockets itself.
+"""
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+from reportlab.pdfgen import canvas
+
+REPORT_MAX_CONCURRENT = int(os.getenv('REPORT_MAX_CONCURRENT', '2'))
+REPORT_MAX_PENDING = int(os.getenv('REPORT_MAX_PENDING', '20'))
+REPORT_TTL_SECONDS = int(os.getenv('REPORT_TTL_SECONDS', '600'))
+
+
+def render_workout_report(rows):
+    """Render the workout history table. ``rows`` are ``Workout.to_dict()`` values."""
+    # Create a file-like buffer to receive PDF data
+    buffer = io.BytesIO()
+
+    # Create the PDF object, using the buffer as its "file."
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    elements = []
+
+    # Table data
+    data = [["Date", "Exercise", "Sets", "Reps", "Weight"]]
+    for row in rows:
+        data.append([
+            row['date'],
+            row['exercise'],
+            row['sets'],
+            row['reps'],
+            row['weight'] if row['weight'] is not None else "N/A"
+        ])
+
+    # Create the table
+    table = Table(data)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    elements.append(table)
+
+    # Build the PDF
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def render_diet_report(user):
+    """Render the BMI and diet suggestions page. ``user`` is a plain dict."""
+    bmi = round(user['weight'] / ((user['height'] / 100) ** 2), 2)
+
+    # Create a file-like buffer to receive PDF data
+    buffer = io.BytesIO()
+
+    # Create the PDF object, using the buffer as its "file."
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    # Draw the user data on the PDF
+    pdf.drawString(100, height - 100, f"Name: {user['name']}")
+    pdf.drawString(100, height - 120, f"Email: {user['email']}")
+    pdf.drawString(100, height - 140, f"Age: {user['age']}")
+    pdf.drawString(100, height - 160, f"Height: {user['height']} cm")
+    pdf.drawString(100, height - 180, f"Weight: {user['weight']} kg")
+    pdf.drawString(100, height - 200, f"BMI: {bmi}")
+
+    # Determine BMI status
+    if bmi < 19:
+        bmi_status = "Underweight"
+        diet_suggestions = [
+            "Eat more frequently. Have 5-6 small meals throughout the day.",
+            "Include nutrient-rich foods in your diet, such as whole grains, lean proteins, and healthy fats.",
+            "Drink high-calorie smoothies and shakes.",
+            "Snack on nuts, seeds, and dried fruits.",
+            "Stay hydrated and avoid skipping meals."
+        ]
+    elif bmi >= 19 and bmi <= 25:
+        bmi_status = "Normal"
+        diet_suggestions = [
+            "Maintain a balanced diet with a variety of foods from all food groups.",
+            "Eat plenty of fruits and vegetables.",
+            "Include lean proteins, whole grains, and healthy fats in your meals.",
+            "Stay hydrated by drinking plenty of water.",
+            "Avoid sugary drinks and excessive junk food."
+        ]
+    else:
+        bmi_status = "Overweight"
+        diet_suggestions = [
+            "Eat more fruits and vegetables.",
+            "Choose whole grains over refined grains.",
+            "Include lean proteins, such as chicken, fish, beans, and legumes.",
+            "Avoid sugary drinks and opt for water or herbal teas.",
+            "Reduce your intake of high-calorie, low-nutrient foods.",
+            "Practice portion control and avoid eating late at night."
+        ]
+
+    pdf.drawString(100, height - 220, f"BMI Status: {bmi_status}")
+    pdf.drawString(100, height - 240, "Diet Suggestions:")
+
+    y = height - 260
+    for suggestion in diet_suggestions:
+        pdf.drawString(120, y, f"- {suggestion}")
+        y -= 20
+
+    # Close the PDF object cleanly
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    'workouts': render_workout_report,
+    'diet': render_diet_report,
+}
+
+
+class ReportQueueFull(Exception):
+    pass
+
+
+class ReportJob:
+    def __init__(self, kind, user_id, filename, key):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.user_id = user_id
+        self.filename = filename
+        self.key = key
+        self.status = 'pending'  # pending -> done | error
+        self.pdf = None
+        self.error = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'error')
+
+    def to_dict(self):
+        data = {'job_id': self.id, 'kind': self.kind, 'status': self.status,
+                'status_url': f'/reports/{self.id}'}
+        if self.status == 'done':
+            data['download_url'] = f'/reports/{self.id}/download'
+        if self.error:
+            data['error'] = self.error
+        return data
+
+
+class ReportJobs:
+    def __init__(self, max_concurrent=REPORT_MAX_CONCURRENT, max_pending=REPORT_MAX_PENDING,
+                 ttl=REPORT_TTL_SECONDS, on_finished=None):
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.on_finished = on_finished
+        self.jobs = {}
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self._pool = None
+
+    @property
+    def pool(self):
+        # Created lazily; spawn rather than fork, so children don't inherit the hub
+        with self.lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_concurrent,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def _drop_pool(self, pool):
+        # A child crashed (e.g. OOM-killed): the executor refuses all work
+        # from now on, so replace it on the next submit
+        with self.lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, payload, kind):
+        pool = self.pool
+        try:
+            return pool, pool.submit(RENDERERS[kind], payload)
+        except BrokenProcessPool:
+            self._drop_pool(pool)
+            pool = self.pool
+            return pool, pool.submit(RENDERERS[kind], payload)
+
+    def _prune(self):
+        # Caller holds self.lock
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished and now - job.finished_at > self.ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def submit(self, kind, user_id, filename, payload):
+        """Queue a render, or return the identical job already in flight."""
+        digest = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+        key = (kind, user_id, digest)
+        with self.lock:
+            self._prune()
+            job = self.in_flight.get(key)
+            if job is not None:
+                return job
+            if len(self.in_flight) >= self.max_pending:
+                raise ReportQueueFull('Too many reports are being generated. Please try again shortly.')
+            job = ReportJob(kind, user_id, filename, key)
+            self.jobs[job.id] = job
+            self.in_flight[key] = job
+        try:
+            pool, future = self._submit(payload, kind)
+        except Exception as e:
+            # Never leave a job pending that nothing will finish: identical
+            # requests would be deduped onto it forever
+            print("Report submit error:", repr(e))
+            self._complete(job, error=e)
+            return job
+        future.add_done_callback(lambda f: self._finish(job, f, pool))
+        return job
+
+    def _finish(self, job, future, pool):
+        try:
+            pdf = future.result()
+        except Exception as e:
+            print("Report rendering error:", repr(e))
+            if isinstance(e, BrokenProcessPool):
+                self._drop_pool(pool)
+            self._complete(job, error=e)
+        else:
+            self._complete(job, pdf=pdf)
+
+    def _complete(self, job, pdf=None, error=None):
+        with self.lock:
+            if error is None:
+                job.pdf = pdf
+                job.status = 'done'
+            else:
+                job.error = 'Failed to generate report'
+                job.status = 'error'
+            job.finished_at = time.monotonic()
+            self.in_flight.pop(job.key, None)
+        if self.on_finished is not None:
+            try:
+                self.on_finished(job)
+            except Exception as e:
+                print("Report notification error:", repr(e))
+
+    def get(self, job_id, user_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
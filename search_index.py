@@ -0,0 +1,143 @@
+# search_index.py
+"""Exercise name canonicalisation and full-text search.
+
+Exercise names typed by users ("dumbbell  curl", "Dumbbell Curl") are folded
+to one key so every spelling maps to the same ``Exercise`` row. On SQLite,
+FTS5 indexes back exercise and workout-history search; triggers keep them
+in step with the base tables. The index is created by a migration and
+repaired on ``flask init-db``. Other databases fall back to ``LIKE``.
+"""
+import difflib
+import re
+
+from sqlalchemy import text
+
+FTS_TABLES = {
+    'exercise_fts': ('exercise', 'name'),
+    'workout_fts': ('workout', 'exercise'),
+}
+
+
+def exercise_key(name):
+    """Canonical lookup key for an exercise name."""
+    return ' '.join(re.findall(r'[a-z0-9]+', (name or '').lower()))
+
+
+def fts_query(q):
+    """Turn free text into a prefix match over every word, or ``None``."""
+    tokens = re.findall(r'\w+', (q or '').lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def fts_available(session):
+    return session.get_bind().dialect.name == 'sqlite'
+
+
+def install_search_index(connection):
+    """Create missing FTS5 tables and their sync triggers on ``connection``.
+
+    Safe to run on every start: tables are created once, triggers whenever
+    they are missing (rebuilding a base table, as ``batch_alter_table``
+    does on SQLite, drops them). An index created or left without triggers
+    is rebuilt from its base table.
+    """
+    if connection.dialect.name != 'sqlite':
+        return
+    existing = {row[0] for row in connection.execute(
+        text("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE '%_fts%'"))}
+    for fts_table, (table, column) in FTS_TABLES.items():
+        triggers = {f'{fts_table}_ai', f'{fts_table}_ad', f'{fts_table}_au'}
+        if fts_table in existing and triggers <= existing:
+            continue
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5({column}, content='{table}', "
+            f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')"))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END"))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END"))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+            f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END"))
+        # Index rows written while there was no index or no triggers
+        connection.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+
+
+def drop_search_index(connection):
+    if connection.dialect.name != 'sqlite':
+        return
+    for fts_table in FTS_TABLES:
+        for suffix in ('ai', 'ad', 'au'):
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {fts_table}_{suffix}"))
+        connection.execute(text(f"DROP TABLE IF EXISTS {fts_table}"))
+
+
+def is_search_index_table(name):
+    """True for the FTS5 tables and their shadow tables, which no model
+    declares; migrations/env.py keeps autogenerate from dropping them."""
+    return name.startswith(tuple(FTS_TABLES))
+
+
+def ensure_search_index(session):
+    """Repair the FTS5 index and triggers if a migration left them out."""
+    install_search_index(session.connection())
+    session.commit()
+
+
+def search_exercises(session, q, limit=10, curated=False):
+    """Exercises matching ``q`` as ``(id, name)`` pairs, best first.
+
+    ``curated`` limits the results to the public catalogue. Falls back to
+    close spellings when nothing matches the prefix search.
+    """
+    match = fts_query(q)
+    if match is None:
+        return []
+    only_curated = " AND e.curated" if curated else ""
+    if fts_available(session):
+        rows = session.execute(text(
+            "SELECT e.id, e.name FROM exercise_fts JOIN exercise e ON e.id = exercise_fts.rowid "
+            "WHERE exercise_fts MATCH :match" + only_curated + " ORDER BY rank LIMIT :limit"),
+            {'match': match, 'limit': limit}).all()
+    else:
+        rows = session.execute(text(
+            "SELECT e.id, e.name FROM exercise e WHERE lower(e.name) LIKE :pattern" + only_curated
+            + " ORDER BY e.name LIMIT :limit"),
+            {'pattern': f"%{exercise_key(q)}%", 'limit': limit}).all()
+    if rows:
+        return [(row[0], row[1]) for row in rows]
+
+    # Fuzzy fallback: the exercise dimension is small, so compare in Python
+    names = {row[1]: row[0] for row in session.execute(text("SELECT id, name, curated FROM exercise"))
+             if row[2] or not curated}
+    by_key = {exercise_key(name): name for name in names}
+    close = difflib.get_close_matches(exercise_key(q), list(by_key), n=limit, cutoff=0.6)
+    return [(names[by_key[key]], by_key[key]) for key in close]
+
+
+def search_workouts(session, user_id, q, limit=50):
+    """IDs of the user's workouts whose exercise matches ``q``, newest first."""
+    match = fts_query(q)
+    if match is None:
+        return []
+    if fts_available(session):
+        rows = session.execute(text(
+            "SELECT w.id FROM workout_fts JOIN workout w ON w.id = workout_fts.rowid "
+            "WHERE workout_fts MATCH :match AND w.user_id = :user_id ORDER BY w.date DESC LIMIT :limit"),
+            {'match': match, 'user_id': user_id, 'limit': limit}).all()
+        if rows:
+            return [row[0] for row in rows]
+    # Unindexed databases, or a misspelling: go through the exercise dimension
+    exercise_ids = [exercise_id for exercise_id, _ in search_exercises(session, q)]
+    if not exercise_ids:
+        return []
+    rows = session.execute(text(
+        "SELECT id FROM workout WHERE user_id = :user_id AND exercise_id IN ("
+        + ', '.join(str(int(i)) for i in exercise_ids) + ") ORDER BY date DESC LIMIT :limit"),
+        {'user_id': user_id, 'limit': limit}).all()
+    return [row[0] for row in rows]
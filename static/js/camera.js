@@ -8,12 +8,23 @@ document.addEventListener('DOMContentLoaded', () => {
     canvas.width = 640;
     canvas.height = 480;
 
-    function drawFrame(imageData) {
+    // Ack every frame once it is drawn; the server only keeps a couple of
+    // unacknowledged frames in flight, so slow clients get fewer frames
+    // instead of a growing delay.
+    // Frames arrive as binary JPEG; draw them through a short-lived blob URL.
+    function drawFrame(jpeg, seq) {
         const img = new Image();
+        const url = URL.createObjectURL(new Blob([jpeg], { type: 'image/jpeg' }));
+        const done = () => {
+            URL.revokeObjectURL(url);
+            if (typeof seq !== 'undefined') socket.emit('frame-ack', { seq });
+        };
         img.onload = () => {
             ctx.drawImage(img, 0, 0, canvas.width, canvas.height);
+            done();
         };
-        img.src = imageData;
+        img.onerror = done;
+        img.src = url;
     }
 
     // Handle connection events
@@ -36,17 +47,30 @@ document.addEventListener('DOMContentLoaded', () => {
     window.startCamera = function() {
         if (!isStreaming) {
             console.log('Requesting camera stream...');
-            socket.emit('start-stream');
+            const select = document.getElementById('exercise-select');
+            const exercise = select && select.selectedIndex >= 0 ? select.options[select.selectedIndex].text : null;
+            const groupToggle = document.getElementById('group-mode');
+            const mode = groupToggle && groupToggle.checked ? 'group' : 'single';
+            socket.emit('start-stream', { exercise, weight: window.currentWeight, mode });
             isStreaming = true;
         }
     };
 
+    // The server lowers pose quality under load and reports the active tier
+    socket.on('quality-tier', (data) => {
+        if (!data) return;
+        window.qualityTier = data.tier;
+        console.log('[quality] pose tier ->', data.tier, data);
+        const tierLabel = document.getElementById('quality-tier');
+        if (tierLabel) tierLabel.textContent = data.tier;
+    });
+
     // Handle incoming video frames with pose detection
     socket.on('video-frame', (data) => {
         try {
             if (data && data.frame) {
-                const imageData = `data:image/jpeg;base64,${data.frame}`;
-                drawFrame(imageData);
+                drawFrame(data.frame, data.seq);
+                if (data.people) renderGroup(data.people);
             } else {
                 console.error('Invalid frame data received:', data);
             }
@@ -56,96 +80,45 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 
 
-        // --- rep-count handler with: count-first-rep-as-1, snackbar, localStorage persistence ---
-    socket.on('rep-count', (data) => {
-        try {
-            if (!data) return;
-            let count = null;
-            if (typeof data === 'number') {
-                count = data;
-            } else if (data && typeof data.count !== 'undefined') {
-                count = data.count;
-            }
-
-            // Defensive: coerce to number if possible
-            if (count !== null) count = Number(count);
-
-            console.log('[rep-debug] received rep-count ->', count);
-
-            // Restore persisted state if available
-            if (typeof window.lastRepTime === 'undefined') {
-                const persistedTime = localStorage.getItem('lastRepTime');
-                window.lastRepTime = persistedTime ? Number(persistedTime) : null;
-            }
-            if (typeof window.lastRepCount === 'undefined') {
-                const persistedCount = localStorage.getItem('lastRepCount');
-                window.lastRepCount = persistedCount ? Number(persistedCount) : null;
-            }
-            if (typeof window.currentSets === 'undefined') {
-                const persistedSets = localStorage.getItem('currentSets');
-                window.currentSets = persistedSets ? Number(persistedSets) : 1;
-            }
-            if (typeof window.currentReps === 'undefined') window.currentReps = 0;
-
-            // Only update on valid numeric counts
-            if (typeof count === 'number' && isFinite(count)) {
-                const now = Date.now();
-
-                // If this is the very first rep we have seen, just set values
-                if (window.lastRepCount === null) {
-                    window.lastRepCount = count;
-                    window.lastRepTime = now;
-                    window.currentReps = count;
-                    // persist
-                    localStorage.setItem('lastRepTime', String(window.lastRepTime));
-                    localStorage.setItem('lastRepCount', String(window.lastRepCount));
-                    localStorage.setItem('currentSets', String(window.currentSets));
-                    if (typeof window.updateReps === 'function') window.updateReps(window.currentReps);
-                    else if (typeof renderCounters === 'function') renderCounters();
-                    return;
-                }
-
-                // If rep count increased -> a new rep was detected
-                if (count > window.lastRepCount) {
-                    const diffMs = (window.lastRepTime ? (now - window.lastRepTime) : Infinity);
-
-                    // If gap > 2 minutes -> treat as new set: increment sets and set reps = 1
-                    if (diffMs > 2 * 60 * 1000) {
-                        window.currentSets = (window.currentSets || 1) + 1;
-                        window.currentReps = 1; // first rep of the new set counts as 1
-                        showSnackbar(`New set started — Sets: ${window.currentSets}`);
-                        console.log(`[rep-debug] gap ${Math.round(diffMs/1000)}s > 120s: increment sets -> ${window.currentSets}, set reps -> 1`);
-                    } else {
-                        // Normal case: continue counting reps within same set
-                        window.currentReps = count;
-                    }
-
-                    // update last seen
-                    window.lastRepCount = count;
-                    window.lastRepTime = now;
-
-                    // persist
-                    localStorage.setItem('lastRepTime', String(window.lastRepTime));
-                    localStorage.setItem('lastRepCount', String(window.lastRepCount));
-                    localStorage.setItem('currentSets', String(window.currentSets));
+    // Reps and sets are segmented on the server: it sends one event per
+    // completed rep and one when a set ends (after an idle gap or when the
+    // stream stops). Completed sets are saved server-side for logged-in users.
+    socket.on('rep-event', (data) => {
+        if (!data) return;
+        window.currentSets = data.set;
+        window.currentReps = data.rep;
+        if (typeof window.updateSets === 'function') window.updateSets(window.currentSets);
+        if (typeof window.updateReps === 'function') window.updateReps(window.currentReps);
+        else if (typeof renderCounters === 'function') renderCounters();
+    });
 
-                    // Update UI
-                    if (typeof window.updateReps === 'function') window.updateReps(window.currentReps);
-                    else if (typeof renderCounters === 'function') renderCounters();
+    function showSnackbar(message) {
+        const snackbar = document.getElementById('snackbar');
+        if (!snackbar) return;
+        snackbar.textContent = message;
+        snackbar.style.display = 'block';
+        clearTimeout(showSnackbar.timer);
+        showSnackbar.timer = setTimeout(() => { snackbar.style.display = 'none'; }, 3000);
+    }
 
-                } else {
-                    // count did not increase — no new rep. Do nothing
-                }
-            } else {
-                // Non-numeric count -> reset to 0 to be safe
-                window.currentReps = 0;
-                if (typeof window.updateReps === 'function') window.updateReps(window.currentReps);
-                else if (typeof renderCounters === 'function') renderCounters();
-            }
-        } catch (err) {
-            console.error('Error processing rep-count event:', err);
-        }
+    socket.on('set-complete', (data) => {
+        if (!data) return;
+        const status = data.saved ? 'saved' : 'not saved';
+        showSnackbar(`Set ${data.set} complete — ${data.reps} reps (${status})`);
     });
+
+    // Group mode: each video frame carries every tracked person's reps
+    function renderGroup(people) {
+        const list = document.getElementById('group-people');
+        if (!list) return;
+        list.innerHTML = '';
+        people.forEach((person) => {
+            const item = document.createElement('li');
+            item.textContent = `#${person.id}: ${person.reps} reps${person.stage ? ` (${person.stage})` : ''}`;
+            if (!person.visible) item.style.opacity = '0.5';
+            list.appendChild(item);
+        });
+    }
     
 
 
@@ -63,7 +63,7 @@ class FitTabChatbot {
             // Show typing indicator
             this.showTypingIndicator();
 
-            // Make API call
+            // Submit the message; the server answers with a job id right away
             const response = await fetch('/chatbot/chat', {
                 method: 'POST',
                 headers: {
@@ -72,26 +72,25 @@ class FitTabChatbot {
                 body: JSON.stringify({ message })
             });
 
-            // Remove typing indicator
-            this.hideTypingIndicator();
+            if (response.status === 429) {
+                const errorData = await response.json();
+                this.hideTypingIndicator();
+                this.addMessageToChat('bot', errorData.error || 'The assistant is busy. Please try again shortly.');
+                return;
+            }
 
             if (!response.ok) {
                 const errorData = await response.json();
                 throw new Error(errorData.error || 'Failed to get response from server');
             }
 
-            const data = await response.json();
-            
-            if (data.error) {
-                throw new Error(data.error);
-            }
-
-            if (data.response || data.html_response) {
-                this.addMessageToChat('bot', data.response || 'No response text', data.html_response);
-            } else {
+            const job = await response.json();
+            if (!job.stream_url) {
                 throw new Error('Invalid response format from server');
             }
 
+            await this.streamReply(job.stream_url);
+
         } catch (error) {
             console.error('Error in sendMessage:', error);
             this.hideTypingIndicator();
@@ -99,6 +98,64 @@ class FitTabChatbot {
         }
     }
 
+    streamReply(streamUrl) {
+        return new Promise((resolve, reject) => {
+            const source = new EventSource(streamUrl);
+            let contentDiv = null;
+
+            source.onmessage = (event) => {
+                let data;
+                try {
+                    data = JSON.parse(event.data);
+                } catch (err) {
+                    source.close();
+                    reject(err);
+                    return;
+                }
+
+                if (data.status === 'error') {
+                    source.close();
+                    if (contentDiv) contentDiv.parentElement.remove();
+                    reject(new Error(data.error || 'Failed to get response from server'));
+                    return;
+                }
+
+                // Render partial answers as they arrive; the server sends the
+                // sanitized HTML for everything generated so far
+                if (data.html_response || data.response) {
+                    if (!contentDiv) {
+                        this.hideTypingIndicator();
+                        contentDiv = this.addMessageToChat('bot', data.response, data.html_response);
+                    } else {
+                        this.updateMessage(contentDiv, data.response, data.html_response);
+                    }
+                }
+
+                if (data.status === 'done') {
+                    source.close();
+                    this.hideTypingIndicator();
+                    if (!contentDiv) this.addMessageToChat('bot', 'No response text');
+                    resolve();
+                }
+            };
+
+            source.onerror = () => {
+                source.close();
+                reject(new Error('Lost connection to the assistant'));
+            };
+        });
+    }
+
+    updateMessage(contentDiv, text, html = null) {
+        if (html) {
+            contentDiv.innerHTML = html;
+        } else {
+            contentDiv.textContent = text;
+        }
+        const messagesContainer = document.getElementById('chatbot-messages');
+        if (messagesContainer) messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    }
+
     addMessageToChat(sender, text, html = null) {
         const messagesContainer = document.getElementById('chatbot-messages');
         if (!messagesContainer) return;
@@ -118,6 +175,7 @@ class FitTabChatbot {
         messageDiv.appendChild(contentDiv);
         messagesContainer.appendChild(messageDiv);
         messagesContainer.scrollTop = messagesContainer.scrollHeight;
+        return contentDiv;
     }
 
     showTypingIndicator() {
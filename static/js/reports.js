@@ -0,0 +1,48 @@
+// Report downloads: the server renders PDFs in the background, so ask for a
+// job, poll until it is ready, then fetch the finished file.
+async function requestReport(url, button) {
+    const originalText = button ? button.textContent : null;
+    if (button) {
+        button.disabled = true;
+        button.textContent = 'Preparing PDF...';
+    }
+
+    try {
+        const response = await fetch(url, { method: 'POST' });
+        let job = await response.json();
+        if (!response.ok && response.status !== 202) {
+            throw new Error(job.error || 'Failed to start report');
+        }
+
+        let delay = 500;
+        while (job.status === 'pending') {
+            await new Promise(resolve => setTimeout(resolve, delay));
+            delay = Math.min(delay * 1.5, 3000);
+            const status = await fetch(job.status_url);
+            job = await status.json();
+            if (!status.ok) throw new Error(job.error || 'Failed to check report');
+        }
+
+        if (job.status !== 'done') {
+            throw new Error(job.error || 'Failed to generate report');
+        }
+        window.location = job.download_url;
+    } catch (error) {
+        console.error('Report error:', error);
+        alert(error.message);
+    } finally {
+        if (button) {
+            button.disabled = false;
+            button.textContent = originalText;
+        }
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('form[data-report]').forEach((form) => {
+        form.addEventListener('submit', (e) => {
+            e.preventDefault();
+            requestReport(form.action, form.querySelector('button[type="submit"]'));
+        });
+    });
+});
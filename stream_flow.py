@@ -0,0 +1,72 @@
+# stream_flow.py
+"""Credit-based flow control for the video stream.
+
+The client acknowledges every frame it has drawn (``frame-ack``). The server
+keeps at most ``max_unacked`` frames outstanding per session and skips
+encoding while it is out of credits, so a slow client sees fresh frames at
+a lower rate instead of an ever-growing backlog. The measured round trip
+drives the JPEG quality.
+"""
+import os
+import time
+
+STREAM_MAX_UNACKED = int(os.getenv('STREAM_MAX_UNACKED', '2'))
+STREAM_ACK_TIMEOUT_SECONDS = float(os.getenv('STREAM_ACK_TIMEOUT_SECONDS', '2'))
+STREAM_TARGET_RTT_MS = float(os.getenv('STREAM_TARGET_RTT_MS', '150'))
+STREAM_MIN_JPEG_QUALITY = 35
+STREAM_MAX_JPEG_QUALITY = 90
+
+
+class FrameFlowControl:
+    def __init__(self, max_unacked=STREAM_MAX_UNACKED, ack_timeout=STREAM_ACK_TIMEOUT_SECONDS,
+                 target_rtt_ms=STREAM_TARGET_RTT_MS):
+        self.max_unacked = max_unacked
+        self.ack_timeout = ack_timeout
+        self.target_rtt_ms = target_rtt_ms
+        self.last_sent = 0
+        self.last_acked = 0
+        self.sent_at = {}
+        self.rtt_ms = None
+        self.jpeg_quality = 80
+        self.frames_skipped = 0
+
+    @property
+    def unacked(self):
+        return self.last_sent - self.last_acked
+
+    def can_send(self):
+        if self.unacked < self.max_unacked:
+            return True
+        # Acks can get lost (reconnects, old clients): don't stall forever
+        oldest = self.sent_at.get(self.last_acked + 1)
+        if oldest is not None and time.monotonic() - oldest > self.ack_timeout:
+            self.on_ack(self.last_sent, measure=False)
+            return True
+        self.frames_skipped += 1
+        return False
+
+    def next_seq(self):
+        self.last_sent += 1
+        self.sent_at[self.last_sent] = time.monotonic()
+        return self.last_sent
+
+    def on_ack(self, seq, measure=True):
+        try:
+            seq = int(seq)
+        except (TypeError, ValueError):
+            return
+        if seq <= self.last_acked or seq > self.last_sent:
+            return
+        sent_at = self.sent_at.get(seq)
+        for acked in range(self.last_acked + 1, seq + 1):
+            self.sent_at.pop(acked, None)
+        self.last_acked = seq
+        if measure and sent_at is not None:
+            self._adapt_quality((time.monotonic() - sent_at) * 1000)
+
+    def _adapt_quality(self, rtt_ms):
+        self.rtt_ms = rtt_ms if self.rtt_ms is None else self.rtt_ms + 0.2 * (rtt_ms - self.rtt_ms)
+        if self.rtt_ms > self.target_rtt_ms:
+            self.jpeg_quality = max(STREAM_MIN_JPEG_QUALITY, self.jpeg_quality - 5)
+        elif self.rtt_ms < self.target_rtt_ms * 0.5:
+            self.jpeg_quality = min(STREAM_MAX_JPEG_QUALITY, self.jpeg_quality + 2)